@@ -1,8 +1,15 @@
-from fastapi import FastAPI
+from typing import Optional
+
+from fastapi import FastAPI, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 import logging
+from config.settings import API_CACHE_MAX_BYTES
+from data.snapshot import SnapshotReader
+from data.storage import connect, load_epi_data
+from utils.cache import ByteLRUCache
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,25 +25,126 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/data_endpoint")i
-def get_epi_data():
+# Cada worker mapeia o snapshot publicado pela ingestão e troca de versão sozinho
+snapshots = SnapshotReader()
+
+# Respostas já serializadas por (versão, parâmetros normalizados, formato)
+result_cache = ByteLRUCache(API_CACHE_MAX_BYTES)
+_cache_versao = None
+_cache_lock = threading.Lock()
+
+MEDIA_TYPES = {"json": "application/json", "csv": "text/csv; charset=utf-8"}
+
+def sync_cache_version(versao):
+    """
+    Esvazia o cache quando o snapshot muda de versão (nova carga da ingestão).
+    """
+    global _cache_versao
+    if versao == _cache_versao:
+        return
+    with _cache_lock:
+        if versao != _cache_versao:
+            result_cache.clear()
+            _cache_versao = versao
+            logger.info(f"Cache de resultados invalidado para a versão {versao}")
+
+def normalize_query(estado=None, municipio=None, inicio=None, fim=None, dias=None):
+    """
+    Normaliza os filtros para que consultas equivalentes usem a mesma chave.
+    """
+    return (
+        estado.strip().upper() if estado else None,
+        municipio.strip() if municipio else None,
+        str(np.datetime64(inicio.strip(), "D")) if inicio else None,
+        str(np.datetime64(fim.strip(), "D")) if fim else None,
+        int(dias) if dias else None,
+    )
+
+def serialize(data, formato):
+    """Serializa o resultado no formato pedido"""
+    if formato == "csv":
+        return data.to_csv(index=False).encode("utf-8")
+    return data.to_json(orient="records", force_ascii=False).encode("utf-8")
+
+def load_from_database(estado=None, municipio=None, inicio=None, fim=None, dias=None):
     """
-    Busca dados do arbovirose.db.
-    Retorna dados JSON ou mensagem de erro.
+    Consulta direta ao banco de DATABASE_URL, usada enquanto nenhum snapshot foi publicado.
     """
+    conn = connect()
     try:
-        conn = sqlite3.connect("arbovirose.db")
-        data = pd.read_sql_query("SELECT * FROM epi_data", conn)
+        data = load_epi_data(conn)
+    finally:
         conn.close()
-        if data.empty:
-            logger.warning("Nenhum dado encontrado na tabela epi_data")
-            return {"error": "Nenhum dado encontrado na tabela epi_data"}
-        logger.info(f"Servidos {len(data)} registros da tabela epi_data")
-        return data.to_dict(orient="records")
+    if estado:
+        data = data[data["estado"] == estado.upper()]
+    if municipio:
+        data = data[data["municipio"] == municipio]
+    if dias and not data.empty:
+        inicio = (pd.to_datetime(data["data"]).max() - pd.Timedelta(days=dias)).strftime("%Y-%m-%d")
+    if inicio:
+        data = data[data["data"] >= inicio]
+    if fim:
+        data = data[data["data"] <= fim]
+    return data
+
+@app.get("/data_endpoint")
+def get_epi_data(
+    estado: Optional[str] = None,
+    municipio: Optional[str] = None,
+    inicio: Optional[str] = None,
+    fim: Optional[str] = None,
+    dias: Optional[int] = None,
+    formato: str = Query("json", pattern="^(json|csv)$"),
+):
+    """
+    Busca dados do snapshot atual (ou do banco, se não houver snapshot).
+    Aceita filtros por estado, município e período, em JSON ou CSV.
+    Respostas do snapshot ficam em cache até a próxima versão.
+    Retorna dados JSON/CSV ou mensagem de erro.
+    """
+    try:
+        snapshot = snapshots.current()
+        versao = snapshot.versao if snapshot is not None else None
+        sync_cache_version(versao)
+        filtros = normalize_query(estado, municipio, inicio, fim, dias)
+        chave = (versao, formato) + filtros
+
+        corpo = result_cache.get(chave) if versao else None
+        cache_status = "HIT" if corpo is not None else "MISS"
+        if corpo is None:
+            estado, municipio, inicio, fim, dias = filtros
+            if snapshot is not None:
+                data = snapshot.query(estado=estado, municipio=municipio, inicio=inicio, fim=fim, dias=dias)
+            else:
+                data = load_from_database(estado=estado, municipio=municipio, inicio=inicio, fim=fim, dias=dias)
+            if data.empty:
+                logger.warning("Nenhum dado encontrado na tabela epi_data")
+                return {"error": "Nenhum dado encontrado na tabela epi_data"}
+            corpo = serialize(data, formato)
+            if versao:
+                result_cache.put(chave, corpo)
+            logger.info(f"Servidos {len(data)} registros da tabela epi_data")
+
+        headers = {"X-Cache": cache_status}
+        if versao:
+            headers["X-Dataset-Version"] = versao
+        return Response(content=corpo, media_type=MEDIA_TYPES[formato], headers=headers)
     except Exception as e:
         logger.error(f"Erro ao buscar dados: {str(e)}")
         return {"error": str(e)}
 
+@app.get("/stats")
+def stats():
+    """
+    Estatísticas do worker: versão do snapshot e uso do cache de resultados.
+    """
+    snapshot = snapshots.current()
+    return {
+        "dataset_version": snapshot.versao if snapshot is not None else None,
+        "registros": len(snapshot) if snapshot is not None else None,
+        "cache": result_cache.stats(),
+    }
+
 @app.get("/ping")
 def ping():
     """
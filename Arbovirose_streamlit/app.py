@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
+import folium
 import requests
 import logging
+from functools import cache
 from datetime import datetime, timedelta
 from components.charts import create_time_series_chart
-from components.maps import create_incidence_map
+from components.figure_cache import dataset_version, figure_cache
+from components.maps import choropleth_from_spec, choropleth_spec, create_incidence_map
+from config.settings import API_URL
+from data.geometry import choose_level
+from streamlit_folium import st_folium
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,7 +22,7 @@ def get_realtime_data():
     Busca dados da API hospedada no Render (arbovirose.db).
     Retorna um pandas DataFrame ou dados de exemplo se a consulta falhar.
     """
-    api_url = st.secrets.get("api", {}).get("url", "https://arbovirose-streamlit.onrender.com/data_endpoint")
+    api_url = st.secrets.get("api", {}).get("url", API_URL)
     try:
         logger.info(f"Buscando dados da API: {api_url}")
         response = requests.get(api_url)
@@ -25,6 +31,10 @@ def get_realtime_data():
         if 'data' in data.columns:
             data['data'] = pd.to_datetime(data['data'])
         data.to_json("backup_data.json", orient="records", date_format="iso")
+        # Versão do snapshot servido pela API; identifica as figuras em cache.
+        # Sem o cabeçalho, o hash é calculado aqui, uma vez por carga em cache,
+        # e não a cada rerun em dataset_version
+        data.attrs["versao"] = response.headers.get("X-Dataset-Version") or dataset_version(data)
         logger.info(f"Obtidos {len(data)} registros da API")
         return data
     except requests.exceptions.RequestException as e:
@@ -45,11 +55,14 @@ def load_fallback_data():
         df = pd.read_json("backup_data.json", convert_dates=['data'])
         st.warning("Usando dados em cache devido à falha na API.")
         logger.info("Dados em cache carregados")
-        return df
-    except (FileNotFileNotFoundError, ValueError) as e:
+    except (FileNotFoundError, ValueError) as e:
         st.warning("Nenhum dado em cache disponível. Usando dados de exemplo.")
         logger.warning(f"Erro nos dados em cache: {str(e)}. Carregando dados de exemplo.")
-        return load_sample_data()
+        df = load_sample_data()
+    if df is not None:
+        # Hash do conteúdo calculado uma vez por carga (get_realtime_data fica em cache)
+        df.attrs["versao"] = dataset_version(df)
+    return df
 
 def load_sample_data():
     """
@@ -79,7 +92,7 @@ def test_api_connection(api_url=None):
     Exibe resultados no Streamlit e retorna True se bem-sucedido.
     """
     if api_url is None:
-        api_url = st.secrets.get("api", {}).get("url", "https://arbovirose-streamlit.onrender.com/data_endpoint")
+        api_url = st.secrets.get("api", {}).get("url", API_URL)
     try:
         logger.info(f"Testando conexão com a API: {api_url}")
         response = requests.get(api_url, timeout=10)
@@ -138,20 +151,64 @@ def main():
     data = get_realtime_data()
 
     if data is not None and not data.empty:
-        # Aplicar filtros
-        if estado != "Todos":
-            data = data[data['estado'] == estado]
-        if 'data' in data.columns:
-            end_date = data['data'].max()
-            start_date = end_date - pd.Timedelta(days=periodo)
-            data = data[(data['data'] >= start_date) & (data['data'] <= end_date)]
+        versao = dataset_version(data)
+        filtros = {"estado": estado, "periodo": periodo}
+
+        @cache
+        def filtrar():
+            filtrado = data
+            if estado != "Todos":
+                filtrado = filtrado[filtrado['estado'] == estado]
+            if 'data' in filtrado.columns:
+                end_date = filtrado['data'].max()
+                start_date = end_date - pd.Timedelta(days=periodo)
+                filtrado = filtrado[(filtrado['data'] >= start_date) & (filtrado['data'] <= end_date)]
+            return filtrado
         
-        # Exibir visualizações
+        # Exibir visualizações (filtro e construção só rodam se a figura não estiver em cache)
         try:
-            chart = create_time_series_chart(data)
-            map_fig = create_incidence_map(data)
+            chart = figure_cache.get_or_build(
+                "serie_temporal", filtros, versao, lambda: create_time_series_chart(filtrar())
+            )
+            # Vista (centro e zoom) informada pelo mapa; ao trocar de estado o mapa se ajusta de novo
+            escopo = None if estado == "Todos" else estado
+            vista = st.session_state.get("mapa_vista")
+            if vista and vista["estado"] != estado:
+                vista = None
+            zoom = vista["zoom"] if vista else None
+            params_mapa = {**filtros, "nivel": choose_level(estado=escopo, zoom=zoom)}
+            # O spec do coroplético (geometrias e valores) fica em cache; sem geometrias geradas, é None
+            spec = figure_cache.get_or_build_spec(
+                "mapa_incidencia", params_mapa, versao,
+                lambda: choropleth_spec(filtrar(), estado=escopo, zoom=zoom)
+            )
             st.plotly_chart(chart, use_container_width=True)
-            st.plotly_chart(map_fig, use_container_width=True)
+            if spec is not None:
+                # Enquanto a camada não muda o mapa é montado igual, e o componente mantém a vista do usuário;
+                # uma camada nova abre na vista atual e só ajusta os limites na primeira renderização
+                render = st.session_state.get("mapa_render")
+                if render is None or render["params"] != params_mapa:
+                    render = {"params": params_mapa, "vista": vista}
+                    st.session_state["mapa_render"] = render
+                inicial = render["vista"] or {}
+                map_fig = choropleth_from_spec(spec, centro=inicial.get("centro"), zoom=inicial.get("zoom"))
+                retorno = st_folium(map_fig, key=f"mapa_incidencia_{estado}", use_container_width=True, height=520,
+                                    returned_objects=["zoom", "center"])
+                if retorno and retorno.get("zoom") is not None and retorno.get("center"):
+                    centro = retorno["center"]
+                    st.session_state["mapa_vista"] = {
+                        "estado": estado, "centro": [centro["lat"], centro["lng"]], "zoom": retorno["zoom"]
+                    }
+            else:
+                # Marcadores (folium, não entram no cache) ou dispersão (Plotly, em cache)
+                map_fig = figure_cache.get_or_build(
+                    "mapa_incidencia_alternativo", filtros, versao,
+                    lambda: create_incidence_map(filtrar(), estado=escopo)
+                )
+                if isinstance(map_fig, folium.Map):
+                    st_folium(map_fig, use_container_width=True, height=520, returned_objects=[])
+                else:
+                    st.plotly_chart(map_fig, use_container_width=True)
         except Exception as e:
             st.error(f"Erro ao gerar visualizações: {str(e)}")
             logger.error(f"Erro de visualização: {str(e)}")
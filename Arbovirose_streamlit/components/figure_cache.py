@@ -0,0 +1,185 @@
+# Arbovirose_streamlit/components/figure_cache.py
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from config.settings import FIGURE_CACHE_DIR, FIGURE_CACHE_MAX_BYTES
+from utils.cache import ByteLRUCache
+
+logger = logging.getLogger(__name__)
+
+def dataset_version(data):
+    """
+    Identify the dataset a figure was built from.
+    
+    Uses data.attrs['versao'] when the loader set it (e.g. the API's
+    X-Dataset-Version header or the published snapshot version); otherwise
+    falls back to a content hash, so backup and sample data still get a
+    stable version.
+    
+    Args:
+        data (pd.DataFrame): dataset displayed by the page
+    
+    Returns:
+        str: dataset version
+    """
+    versao = data.attrs.get('versao')
+    if versao:
+        return str(versao)
+    hash_linhas = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    return hashlib.sha1(hash_linhas.tobytes()).hexdigest()[:16]
+
+class FigureCache:
+    """
+    Cache of serialized figure specs keyed by (kind, params, dataset version).
+    
+    Plotly figures are stored as their JSON spec; components that are not
+    Plotly figures (e.g. the Folium choropleth) store their own byte spec
+    through get_spec/put_spec and rebuild the object from it.
+    
+    Specs live in a byte-bounded in-memory LRU shared by every session of
+    the process and, if a directory is configured, on disk as one file
+    per key so other processes (and restarts) reuse them. Disk entries are
+    grouped by dataset version; only the newest versions are kept.
+    """
+    
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES, path=FIGURE_CACHE_DIR, manter=2):
+        self.memoria = ByteLRUCache(max_bytes)
+        self.path = path or None
+        self.manter = manter
+        self._versoes_vistas = set()
+    
+    @staticmethod
+    def key(kind, params, versao):
+        """Stable hash of (kind, params, version); params must be JSON-serializable"""
+        bruto = json.dumps([kind, params, versao], sort_keys=True, default=str)
+        return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+    
+    def _arquivo(self, versao, chave):
+        pasta = re.sub(r'[^\w.-]', '_', str(versao))
+        return os.path.join(self.path, pasta, f"{chave}.json")
+    
+    def _ler_disco(self, versao, chave):
+        try:
+            with open(self._arquivo(versao, chave), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _gravar_disco(self, versao, chave, spec):
+        arquivo = self._arquivo(versao, chave)
+        pasta = os.path.dirname(arquivo)
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            # Write then rename so readers in other processes never see a partial file
+            tmp = f"{arquivo}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(spec)
+            os.replace(tmp, arquivo)
+            if versao not in self._versoes_vistas:
+                self._versoes_vistas.add(versao)
+                self._remover_versoes_antigas(pasta)
+        except OSError as e:
+            logger.warning(f"Could not write figure cache entry: {str(e)}")
+    
+    def _remover_versoes_antigas(self, atual):
+        pastas = [os.path.join(self.path, d) for d in os.listdir(self.path)]
+        pastas = sorted((p for p in pastas if os.path.isdir(p)), key=os.path.getmtime)
+        for antiga in pastas[:-self.manter]:
+            if antiga != atual:
+                shutil.rmtree(antiga, ignore_errors=True)
+    
+    def get_spec(self, kind, params, versao):
+        """Return the cached spec bytes for (kind, params, version), or None"""
+        chave = self.key(kind, params, versao)
+        spec = self.memoria.get(chave)
+        if spec is None and self.path:
+            spec = self._ler_disco(versao, chave)
+            if spec is not None:
+                self.memoria.put(chave, spec)
+        return spec
+    
+    def put_spec(self, kind, params, versao, spec):
+        """Store spec bytes in memory and, if enabled, on disk"""
+        chave = self.key(kind, params, versao)
+        self.memoria.put(chave, spec)
+        if self.path:
+            self._gravar_disco(versao, chave, spec)
+    
+    def get_or_build_spec(self, kind, params, versao, build):
+        """
+        Return the cached spec bytes for (kind, params, version) or build them.
+        
+        Args:
+            build (callable): no-argument function returning the spec bytes, or None when
+                there is nothing to cache (None is returned and not stored)
+        
+        Returns:
+            bytes or None: cached or freshly built spec
+        """
+        spec = self.get_spec(kind, params, versao)
+        if spec is not None:
+            return spec
+        spec = build()
+        if spec is not None:
+            self.put_spec(kind, params, versao, spec)
+        return spec
+    
+    def get(self, kind, params, versao):
+        """
+        Return the cached figure, or None.
+        
+        Returns:
+            plotly.graph_objects.Figure: figure rebuilt from the cached spec
+        """
+        spec = self.get_spec(kind, params, versao)
+        if spec is None:
+            return None
+        # The spec was produced by Plotly itself, so re-validating it is wasted work
+        return go.Figure(json.loads(spec), _validate=False)
+    
+    def put(self, kind, params, versao, fig):
+        """
+        Serialize a Plotly figure and store it in memory and, if enabled, on disk.
+        
+        Anything else (e.g. a Folium map) is not stored: cache those through
+        put_spec with a spec the component can rebuild the object from.
+        """
+        if not isinstance(fig, go.Figure):
+            logger.debug(f"Figure cache skipped non-Plotly {kind} ({type(fig).__name__})")
+            return
+        self.put_spec(kind, params, versao, fig.to_json().encode('utf-8'))
+    
+    def get_or_build(self, kind, params, versao, build):
+        """
+        Return the cached figure for (kind, params, version) or build it.
+        
+        Args:
+            kind (str): chart kind, e.g. 'serie_temporal'
+            params (dict): filter parameters that affect the figure
+            versao (str): dataset version (see dataset_version)
+            build (callable): no-argument function that filters the data and returns a Plotly figure
+        
+        Returns:
+            plotly.graph_objects.Figure: cached or freshly built figure (non-Plotly results are
+            returned as built, but not cached)
+        """
+        fig = self.get(kind, params, versao)
+        if fig is not None:
+            return fig
+        fig = build()
+        self.put(kind, params, versao, fig)
+        return fig
+    
+    def stats(self):
+        """Usage statistics of the in-memory layer"""
+        return self.memoria.stats()
+
+# Shared by every Streamlit session of the process
+figure_cache = FigureCache()
@@ -1,18 +1,253 @@
+import json
 import folium
 import streamlit_folium
+import numpy as np
 import pandas as pd
 import plotly.express as px
+from branca.colormap import linear
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from jinja2 import Template
+from data.collector import UF_POR_CODIGO
+from data.geometry import OBJETO, choose_level, load_topology
 
-def create_incidence_map(data):
+# Number of color classes in the choropleth legend
+CHOROPLETH_CLASSES = 7
+
+class MunicipalChoropleth(JSCSSMixin, Layer):
+    """
+    Choropleth layer drawn in the browser straight from a quantized TopoJSON.
+    
+    Values and names travel as plain arrays aligned with the geometries and
+    colors are resolved in JavaScript from the class limits, instead of a
+    properties/style dict per feature, which keeps the national map small.
+    """
+    
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }}_data = {{ this.data_json }};
+            var {{ this.get_name() }}_valores = {{ this.valores_json }};
+            var {{ this.get_name() }}_nomes = {{ this.nomes_json }};
+            var {{ this.get_name() }}_limites = {{ this.limites|tojson }};
+            var {{ this.get_name() }}_cores = {{ this.cores|tojson }};
+            var {{ this.get_name() }}_features = topojson.feature(
+                {{ this.get_name() }}_data, {{ this.get_name() }}_data.objects.{{ this.objeto }}
+            );
+            {{ this.get_name() }}_features.features.forEach(function(feature, i) {
+                feature.properties = {v: {{ this.get_name() }}_valores[i], n: {{ this.get_name() }}_nomes[i]};
+            });
+            var {{ this.get_name() }} = L.geoJson({{ this.get_name() }}_features, {
+                style: function(feature) {
+                    var valor = feature.properties.v;
+                    var classe = {{ this.get_name() }}_limites.filter(function(l) { return valor >= l; }).length;
+                    return {
+                        fillColor: valor === null ? {{ this.sem_dados|tojson }} : {{ this.get_name() }}_cores[classe],
+                        color: "#666", weight: 0.3, fillOpacity: 0.8
+                    };
+                },
+                onEachFeature: function(feature, layer) {
+                    if (feature.properties.v !== null) {
+                        layer.bindTooltip(feature.properties.n + ": " + feature.properties.v + " casos");
+                    }
+                }
+            }).addTo({{ this._parent.get_name() }});
+            {%- if this.ajustar %}
+            {%- if this.foco is not none %}
+            {{ this.get_name() }}.eachLayer(function(layer) {
+                if (layer.feature.id === {{ this.foco|tojson }}) {
+                    {{ this._parent.get_name() }}.fitBounds(layer.getBounds());
+                }
+            });
+            {%- else %}
+            {{ this._parent.get_name() }}.fitBounds({{ this.get_name() }}.getBounds());
+            {%- endif %}
+            {%- endif %}
+        {% endmacro %}
+    """)
+    
+    default_js = [
+        ("topojson", "https://cdnjs.cloudflare.com/ajax/libs/topojson/1.6.9/topojson.min.js"),
+    ]
+    
+    def __init__(self, data, valores, nomes, limites, cores, sem_dados="#f0f0f0", foco=None, ajustar=True, name=None):
+        """
+        Args:
+            data (dict or str): TopoJSON whose object 'municipios' holds the geometries,
+                or its compact JSON text (see choropleth_spec)
+            valores (list): value per geometry (None for no data)
+            nomes (list): name per geometry, shown in the tooltip
+            limites (list): lower limits of the color classes after the first
+            cores (list): one color per class (len(limites) + 1)
+            sem_dados (str): fill color for municipalities without data
+            foco (int): IBGE code to zoom to, if any
+            ajustar (bool): fit the map to the layer (or to 'foco'); False keeps the
+                map's own location and zoom, e.g. the viewport of the previous render
+        """
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = "MunicipalChoropleth"
+        # Compact separators: the embedded TopoJSON is most of the page weight
+        self.data_json = data if isinstance(data, str) else _compact_json(data)
+        self.valores_json = _compact_json(valores)
+        self.nomes_json = _compact_json(nomes)
+        self.objeto = OBJETO
+        self.limites = limites
+        self.cores = cores
+        self.sem_dados = sem_dados
+        self.foco = foco
+        self.ajustar = ajustar
+
+def _compact_json(valor):
+    return json.dumps(valor, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
+
+def _codigos_por_nome(topologia):
+    """(UF, lower-case name) -> IBGE code for every municipality in a topology"""
+    codigos = {}
+    for geometria in topologia["objects"][OBJETO]["geometries"]:
+        uf = UF_POR_CODIGO.get(geometria["id"] // 100000)
+        nome = (geometria.get("properties") or {}).get("nome")
+        if uf and nome:
+            codigos[(uf, nome.strip().casefold())] = geometria["id"]
+    return codigos
+
+def _join_cases(data, topologia, valor):
+    """
+    Sum 'valor' per IBGE code. Uses 'codigo_ibge' when present, otherwise
+    matches (estado, municipio) against the names stored in the topology.
+    """
+    if 'codigo_ibge' in data.columns:
+        codigos = pd.to_numeric(data['codigo_ibge'], errors='coerce')
+    else:
+        por_nome = _codigos_por_nome(topologia)
+        chaves = zip(data['estado'].astype(str).str.strip().str.upper(),
+                     data['municipio'].astype(str).str.strip().str.casefold())
+        codigos = pd.Series([por_nome.get(chave) for chave in chaves], index=data.index, dtype='float64')
+    casos = data[valor].groupby(codigos).sum()
+    casos.index = casos.index.astype('int64')
+    return casos
+
+def choropleth_spec(data, estado=None, municipio=None, zoom=None, valor='casos_confirmados'):
+    """
+    Build the serialized spec of a municipality choropleth from the
+    precomputed simplified geometries.
+    
+    The resolution level comes from the map zoom (viewport) or, without it,
+    from the filter scope: the national file for the whole country, the
+    per-state files for a state or a single municipality.
+    
+    The spec is a JSON header (values, names, classes, colors, legend)
+    followed by a newline and the compact TopoJSON, so a cached spec is
+    turned back into a map by choropleth_from_spec without parsing or
+    re-serializing the geometries. It does not depend on the viewport.
+    
+    Args:
+        data (pd.DataFrame): 'codigo_ibge' (or 'estado' and 'municipio') and the value column
+        estado (str): state (UF) in scope, if any
+        municipio (str): municipality to focus on, if any
+        zoom (int): current map zoom, if known
+        valor (str): column to aggregate per municipality
+    
+    Returns:
+        bytes or None: None if the geometries for the level were not generated
+    """
+    nivel = choose_level(estado=estado, municipio=municipio, zoom=zoom)
+    topologia = load_topology(nivel, estado if nivel != "brasil" else None)
+    if topologia is None:
+        return None
+    
+    casos = _join_cases(data, topologia, valor)
+    nomes = {}
+    if 'municipio' in data.columns and 'codigo_ibge' in data.columns:
+        nomes = dict(zip(pd.to_numeric(data['codigo_ibge'], errors='coerce'), data['municipio']))
+    
+    # Quantile classes over municipalities with cases; zero falls in the first class
+    positivos = casos[casos > 0].to_numpy(dtype='float64')
+    limites = np.unique(np.quantile(positivos, np.linspace(0, 1, CHOROPLETH_CLASSES)[1:-1])) if len(positivos) else np.array([])
+    paleta = linear.YlOrRd_09.scale(0, 1)
+    cores = [paleta(i / max(len(limites), 1)) for i in range(len(limites) + 1)]
+    
+    # The cached topology is shared: geometries are copied without their properties
+    geometrias, valores, nomes_geo = [], [], []
+    foco = None
+    for geometria in topologia["objects"][OBJETO]["geometries"]:
+        codigo = geometria["id"]
+        nome = (geometria.get("properties") or {}).get("nome")
+        if municipio and nome and nome.casefold() == municipio.strip().casefold():
+            foco = codigo
+        tem_dados = codigo in casos.index
+        valores.append(int(casos[codigo]) if tem_dados else None)
+        nomes_geo.append(nomes.get(codigo, nome) if tem_dados else None)
+        geometrias.append({"type": geometria["type"], "id": codigo, "arcs": geometria["arcs"]})
+    dados = {**topologia, "objects": {OBJETO: {"type": "GeometryCollection", "geometries": geometrias}}}
+    
+    cabecalho = {
+        "valores": valores,
+        "nomes": nomes_geo,
+        "limites": limites.tolist(),
+        "cores": cores,
+        "foco": foco,
+        "maximo": float(positivos.max()) if len(positivos) else None,
+    }
+    # Compact JSON never contains a raw newline, so it separates header and geometries
+    return f"{_compact_json(cabecalho)}\n{_compact_json(dados)}".encode('utf-8')
+
+def choropleth_from_spec(spec, centro=None, zoom=None):
+    """
+    Build the Folium map for a spec from choropleth_spec.
+    
+    Args:
+        spec (bytes): serialized choropleth
+        centro (list): [lat, lon] to open the map at, e.g. the viewport of the previous render
+        zoom (int): zoom to open the map at, together with 'centro'
+    
+    Returns:
+        folium.Map: map fitted to the layer, or kept at 'centro'/'zoom' when given
+    """
+    cabecalho, dados = spec.decode('utf-8').split("\n", 1)
+    cabecalho = json.loads(cabecalho)
+    manter_vista = centro is not None and zoom is not None
+    
+    m = folium.Map(location=centro if manter_vista else [-14.2350, -51.9253], zoom_start=zoom if manter_vista else 4)
+    MunicipalChoropleth(
+        dados, cabecalho["valores"], cabecalho["nomes"], cabecalho["limites"], cabecalho["cores"],
+        foco=cabecalho["foco"], ajustar=not manter_vista
+    ).add_to(m)
+    limites, maximo = cabecalho["limites"], cabecalho["maximo"]
+    if len(limites):
+        legenda = linear.YlOrRd_09.scale(0, maximo).to_step(index=[0, *limites, maximo])
+        legenda.caption = "Casos confirmados"
+        legenda.add_to(m)
+    return m
+
+def create_choropleth_map(data, estado=None, municipio=None, zoom=None, valor='casos_confirmados'):
+    """
+    Create a municipality choropleth (see choropleth_spec).
+    
+    Returns:
+        folium.Map or None: None if the geometries for the level were not generated
+    """
+    spec = choropleth_spec(data, estado=estado, municipio=municipio, zoom=zoom, valor=valor)
+    return choropleth_from_spec(spec) if spec is not None else None
+
+def create_incidence_map(data, estado=None, municipio=None, zoom=None):
     """
     Create an incidence map for dengue cases by municipality.
     
     Args:
-        data (pd.DataFrame): DataFrame with columns 'municipio', 'casos_confirmados', and optionally 'latitude', 'longitude'
+        data (pd.DataFrame): DataFrame with columns 'municipio', 'casos_confirmados', and optionally 'estado', 'codigo_ibge', 'latitude', 'longitude'
+        estado (str): state (UF) in scope, used to pick the geometry level
+        municipio (str): municipality to focus on
+        zoom (int): current map zoom, used to pick the geometry level
     
     Returns:
-        folium.Map or plotly.graph_objects.Figure: Folium map for geospatial data or Plotly scatter as fallback
+        folium.Map or plotly.graph_objects.Figure: choropleth when municipality geometries are available,
+        otherwise Folium markers for geospatial data or Plotly scatter as fallback
     """
+    # Choropleth from the simplified municipality geometries (see data/geometry.py)
+    if 'codigo_ibge' in data.columns or {'estado', 'municipio'}.issubset(data.columns):
+        m = create_choropleth_map(data, estado=estado, municipio=municipio, zoom=zoom)
+        if m is not None:
+            return m
+    
     # Check if geospatial data is available
     if 'latitude' in data.columns and 'longitude' in data.columns:
         # Create a Folium map centered on Brazil
@@ -41,4 +276,47 @@ def create_incidence_map(data):
             title="Incidência de Casos por Data (Fallback)",
             labels={'data': 'Data', 'casos_confirmados': 'Casos Confirmados'}
         )
-        return fig
\ No newline at end of file
+        return fig
+
+def create_neighbors_map(centro, vizinhos, raio_km=None):
+    """
+    Create a map highlighting a municipality and its spatial neighbors.
+    
+    Args:
+        centro (dict): 'municipio', 'latitude', 'longitude' and optionally 'casos_confirmados' of the reference municipality
+        vizinhos (pd.DataFrame): output of MunicipalityIndex.vizinhos, optionally with 'casos_confirmados'
+        raio_km (float): search radius to draw around the reference municipality
+    
+    Returns:
+        folium.Map: Folium map centered on the reference municipality
+    """
+    m = folium.Map(location=[centro['latitude'], centro['longitude']], zoom_start=8)
+    
+    if raio_km is not None:
+        folium.Circle(
+            location=[centro['latitude'], centro['longitude']],
+            radius=raio_km * 1000,
+            color='gray',
+            fill=False,
+            dash_array='5'
+        ).add_to(m)
+    
+    folium.Marker(
+        location=[centro['latitude'], centro['longitude']],
+        popup=f"{centro['municipio']}: {centro.get('casos_confirmados', 0)} casos",
+        icon=folium.Icon(color='red')
+    ).add_to(m)
+    
+    casos = vizinhos['casos_confirmados'] if 'casos_confirmados' in vizinhos.columns else pd.Series(0, index=vizinhos.index)
+    for row, n_casos in zip(vizinhos.itertuples(index=False), casos):
+        folium.CircleMarker(
+            location=[row.latitude, row.longitude],
+            radius=max(4, n_casos / 10),  # Scale radius by case count
+            popup=f"{row.nome}: {n_casos} casos ({row.distancia_km:.0f} km)",
+            color='orange',
+            fill=True,
+            fill_color='orange',
+            fill_opacity=0.6
+        ).add_to(m)
+    
+    return m
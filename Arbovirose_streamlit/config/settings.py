@@ -3,11 +3,56 @@ import os
 # Verifica se estamos no Render
 IS_RENDER = os.getenv('RENDER', 'False').lower() == 'true'
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # Configuração do banco de dados
 if IS_RENDER:
     # Usará a variável de ambiente configurada em run_app.py
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/arbovirose.db")
 else:
-    # Configuração local
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'data', 'arbovirose.db')}"
+    # Configuração local (DATABASE_URL permite apontar jobs, API e páginas para outro banco)
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'data', 'arbovirose.db')}")
+
+# Feature store (arrays semana × município × feature em arquivos mapeados em memória)
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", os.path.join(BASE_DIR, 'data', 'features'))
+
+# Modelos treinados (um arquivo por horizonte de previsão)
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(BASE_DIR, 'data', 'modelos'))
+
+# Snapshots colunares publicados pela ingestão e mapeados pelos workers da API
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(BASE_DIR, 'data', 'snapshots'))
+
+# Cache de respostas serializadas da API (limite total em bytes por worker)
+API_CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Serviços externos (podem apontar para réplicas locais, ex.: no harness de carga)
+MOSQLIMATE_API_URL = os.getenv("MOSQLIMATE_API_URL", "https://api.mosqlimate.org")
+# Se definido, o InfoDengue é consultado por HTTP (api/alertcity) em vez do PySUS
+INFODENGUE_API_URL = os.getenv("INFODENGUE_API_URL")
+MUNICIPIOS_URL = os.getenv(
+    "MUNICIPIOS_URL",
+    "https://raw.githubusercontent.com/kelvins/municipios-brasileiros/main/csv/municipios.csv"
+)
+API_URL = os.getenv("API_URL", "https://arbovirose-streamlit.onrender.com/data_endpoint")
+KEEP_ALIVE_URL = os.getenv("KEEP_ALIVE_URL", "https://arbovirose-streamlit.onrender.com/ping")
+
+# Cache de figuras Plotly serializadas (memória por processo + disco compartilhado).
+# FIGURE_CACHE_DIR vazio desativa a camada em disco.
+FIGURE_CACHE_MAX_BYTES = int(os.getenv("FIGURE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+FIGURE_CACHE_DIR = os.getenv("FIGURE_CACHE_DIR", os.path.join(BASE_DIR, 'data', 'figuras'))
+
+# Malhas municipais (GeoJSON do IBGE) e níveis simplificados em TopoJSON gerados a partir delas
+MUNICIPIOS_GEOJSON_URL = os.getenv(
+    "MUNICIPIOS_GEOJSON_URL",
+    "https://raw.githubusercontent.com/tbrugz/geodata-br/master/geojson/geojs-100-mun.json"
+)
+GEOMETRY_DIR = os.getenv("GEOMETRY_DIR", os.path.join(BASE_DIR, 'data', 'geometrias'))
+
+# Indicadores epidemiológicos semanais (incidência, médias móveis, Rt) por município
+INDICATORS_DIR = os.getenv("INDICATORS_DIR", os.path.join(BASE_DIR, 'data', 'indicadores'))
+
+# Estimativas de população do IBGE por município (SIDRA, tabela 6579, último ano)
+POPULACAO_URL = os.getenv(
+    "POPULACAO_URL",
+    "https://apisidra.ibge.gov.br/values/t/6579/n6/all/v/9324/p/last%201"
+)
@@ -1,40 +1,99 @@
-import sqlite3
 import pandas as pd
+import requests
 from datetime import datetime
 import logging
-from pysus.online_data import Infodengue
 import os
+import time
+from config.settings import INFODENGUE_API_URL, MUNICIPIOS_URL, POPULACAO_URL
+from data.storage import (
+    DATABASE_ERRORS, connect, create_schema, load_epi_data, load_municipios, save_epi_data,
+    save_municipios, save_populacao, save_quarantine
+)
+from data.processor import refresh_feature_store, refresh_indicator_store
+from data.snapshot import publish_snapshot
+from data.spatial import refresh_neighbor_table
+from utils.validators import epidemiological_week, validate_epi_data
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# IBGE state codes -> UF abbreviations
+UF_POR_CODIGO = {
+    11: "RO", 12: "AC", 13: "AM", 14: "RR", 15: "PA", 16: "AP", 17: "TO",
+    21: "MA", 22: "PI", 23: "CE", 24: "RN", 25: "PB", 26: "PE", 27: "AL", 28: "SE", 29: "BA",
+    31: "MG", 32: "ES", 33: "RJ", 35: "SP",
+    41: "PR", 42: "SC", 43: "RS",
+    50: "MS", 51: "MT", 52: "GO", 53: "DF",
+}
+
 def create_database():
     """
-    Create infodengue.db and epi_data table if they don't exist.
+    Connect to the DATABASE_URL database and create the tables if they don't exist.
     """
     try:
-        conn = sqlite3.connect("infodengue.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS epi_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                estado TEXT,
-                municipio TEXT,
-                data TEXT,
-                casos_confirmados INTEGER
-            )
-        """)
-        conn.commit()
+        conn = connect()
+        create_schema(conn)
         logger.info("Database and epi_data table created or verified")
         return conn
-    except sqlite3.Error as e:
+    except DATABASE_ERRORS as e:
         logger.error(f"Error creating database: {str(e)}")
         return None
 
-def fetch_infodengue_data(disease="dengue", start_date="2023-01-01", end_date="2024-12-31"):
+def fetch_alertcity(session, geocode, disease, start_date, end_date, base_url=INFODENGUE_API_URL):
+    """
+    Fetch one municipality from the InfoDengue HTTP API (api/alertcity).
+    Returns a pandas DataFrame with the API fields.
+    """
+    # Epidemiological weeks run Sunday to Saturday (not ISO weeks)
+    start_year, start_week = epidemiological_week(start_date)
+    end_year, end_week = epidemiological_week(end_date)
+    response = session.get(f"{base_url}/api/alertcity", params={
+        "geocode": geocode,
+        "disease": disease,
+        "format": "json",
+        "ew_start": start_week,
+        "ew_end": end_week,
+        "ey_start": start_year,
+        "ey_end": end_year,
+    }, timeout=30)
+    response.raise_for_status()
+    return pd.DataFrame(response.json())
+
+def download_infodengue_http(disease, start_date, end_date, uf, municipios):
+    """
+    Fetch every municipality of a state through the InfoDengue HTTP API.
+    Municipalities that fail are logged and skipped.
+    Returns a pandas DataFrame in the layout returned by PySUS.
     """
-    Fetch data from InfoDengue using PySUS.
+    municipios_uf = municipios[municipios["estado"] == uf]
+    dataframes = []
+    with requests.Session() as session:
+        for geocode, nome in zip(municipios_uf["codigo_ibge"], municipios_uf["nome"]):
+            try:
+                df = fetch_alertcity(session, int(geocode), disease, start_date, end_date)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.warning(f"Error fetching InfoDengue data for {geocode}: {str(e)}")
+                continue
+            if df.empty:
+                continue
+            # data_iniSE comes as epoch milliseconds
+            if pd.api.types.is_numeric_dtype(df["data_iniSE"]):
+                df["data_iniSE"] = pd.to_datetime(df["data_iniSE"], unit="ms")
+            dataframes.append(pd.DataFrame({
+                "data_iniSE": df["data_iniSE"],
+                "casos": df["casos"],
+                "municipio_nome": nome,
+                "uf": uf,
+            }))
+    if not dataframes:
+        return pd.DataFrame(columns=["data_iniSE", "casos", "municipio_nome", "uf"])
+    return pd.concat(dataframes, ignore_index=True)
+
+def fetch_infodengue_data(disease="dengue", start_date="2023-01-01", end_date="2024-12-31", municipios=None):
+    """
+    Fetch data from InfoDengue using PySUS, or from the HTTP API when
+    INFODENGUE_API_URL is configured (needs the municipios list).
     Returns a pandas DataFrame.
     """
     try:
@@ -43,71 +102,155 @@ def fetch_infodengue_data(disease="dengue", start_date="2023-01-01", end_date="2
         states = ["MG", "SP", "RJ"]
         dataframes = []
         for state in states:
-            df = Infodengue.download(
-                disease=disease,
-                start_date=start_date,
-                end_date=end_date,
-                uf=state
-            )
+            if INFODENGUE_API_URL and municipios is not None:
+                df = download_infodengue_http(disease, start_date, end_date, state, municipios)
+            else:
+                from pysus.online_data import Infodengue
+                df = Infodengue.download(
+                    disease=disease,
+                    start_date=start_date,
+                    end_date=end_date,
+                    uf=state
+                )
             dataframes.append(df)
         data = pd.concat(dataframes, ignore_index=True)
+        # data_iniSE may come as epoch milliseconds
+        if pd.api.types.is_numeric_dtype(data["data_iniSE"]):
+            data["data_iniSE"] = pd.to_datetime(data["data_iniSE"], unit="ms")
         
         # Standardize column names to match epi_data table
         data = data.rename(columns={
-            "SE": "data",  # Epidemiological week or date
+            "data_iniSE": "data",  # First day of the epidemiological week ('SE' is the week number)
             "casos": "casos_confirmados",
             "municipio_nome": "municipio",
             "uf": "estado"
         })
-        # Convert date to ISO format
-        if "data" in data.columns:
-            data["data"] = pd.to_datetime(data["data"]).dt.strftime("%Y-%m-%d")
+        # Type and date normalization is done by validate_epi_data
         logger.info(f"Fetched {len(data)} rows from InfoDengue")
-        return data[["estado", "municipio", "data", "casos_confirmados"]]
+        return data.reindex(columns=["estado", "municipio", "data", "casos_confirmados"])
     except Exception as e:
         logger.error(f"Error fetching InfoDengue data: {str(e)}")
         return None
 
+def fetch_municipios(url=MUNICIPIOS_URL):
+    """
+    Fetch the municipality reference list (IBGE code, name, state and
+    centroid coordinates).
+    Returns a pandas DataFrame in the layout of the municipios table.
+    """
+    try:
+        data = pd.read_csv(url)
+        data["estado"] = data["codigo_uf"].map(UF_POR_CODIGO)
+        data["populacao"] = None
+        logger.info(f"Fetched {len(data)} municipalities")
+        return data[["codigo_ibge", "nome", "estado", "latitude", "longitude", "populacao"]]
+    except Exception as e:
+        logger.error(f"Error fetching municipalities: {str(e)}")
+        return None
+
+def fetch_populacao(url=POPULACAO_URL):
+    """
+    Fetch IBGE population estimates per municipality from the SIDRA API.
+    The first row of the response holds the column descriptions.
+    Returns a pandas DataFrame with 'codigo_ibge' and 'populacao'.
+    """
+    try:
+        response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        data = pd.DataFrame(response.json()[1:])
+        # Municipalities without an estimate come as '...' or '-'
+        data = pd.DataFrame({
+            "codigo_ibge": pd.to_numeric(data["D1C"], errors="coerce"),
+            "populacao": pd.to_numeric(data["V"], errors="coerce"),
+        }).dropna()
+        logger.info(f"Fetched population for {len(data)} municipalities")
+        return data
+    except Exception as e:
+        logger.error(f"Error fetching population: {str(e)}")
+        return None
+
+def populate_municipios():
+    """
+    Refresh the municipios table and the precomputed neighbor table.
+    """
+    conn = create_database()
+    if not conn:
+        return
+
+    data = fetch_municipios()
+    if data is None or data.empty:
+        logger.warning("No municipalities to insert into database")
+        conn.close()
+        return
+
+    try:
+        save_municipios(conn, data)
+        refresh_neighbor_table(conn)
+        logger.info(f"Inserted {len(data)} rows into municipios table")
+        populacao = fetch_populacao()
+        if populacao is not None:
+            logger.info(f"Updated population of {save_populacao(conn, populacao)} municipalities")
+    except DATABASE_ERRORS as e:
+        logger.error(f"Error inserting municipalities: {str(e)}")
+    finally:
+        conn.close()
+
 def populate_database():
     """
-    Populate infodengue.db with data from InfoDengue.
+    Populate the DATABASE_URL database with data from InfoDengue.
     """
     conn = create_database()
     if not conn:
         return
     
-    data = fetch_infodengue_data()
+    municipios = load_municipios(conn)
+    data = fetch_infodengue_data(municipios=municipios)
     if data is None or data.empty:
         logger.warning("No data to insert into database")
         conn.close()
         return
     
     try:
-        cursor = conn.cursor()
-        # Clear existing data (optional, comment out to append)
-        cursor.execute("DELETE FROM epi_data")
-        
-        # Insert data
-        for _, row in data.iterrows():
-            cursor.execute("""
-                INSERT INTO epi_data (estado, municipio, data, casos_confirmados)
-                VALUES (?, ?, ?, ?)
-            """, (
-                row["estado"],
-                row["municipio"],
-                row["data"],
-                row["casos_confirmados"]
-            ))
-        conn.commit()
+        start = time.perf_counter()
+        data, rejected = validate_epi_data(data, municipios)
+        save_quarantine(conn, rejected, fonte="infodengue")
+        logger.info(
+            f"Validation took {(time.perf_counter() - start) * 1000:.1f} ms: "
+            f"{len(data)} valid, {len(rejected)} quarantined"
+        )
+        if data.empty:
+            logger.warning("No valid rows to insert into database")
+            conn.close()
+            return
+
+        # Replaces the fetched states and period; delete and bulk insert
+        # run in the same transaction
+        save_epi_data(data)
         logger.info(f"Inserted {len(data)} rows into epi_data table")
-    except sqlite3.Error as e:
+    except DATABASE_ERRORS as e:
         logger.error(f"Error inserting data: {str(e)}")
+        conn.close()
+        return
+
+    try:
+        # The API serves the published snapshot, so the new rows only show
+        # up (and the response cache version only changes) once it is republished
+        publish_snapshot(load_epi_data(conn))
+    except OSError as e:
+        logger.error(f"Error publishing snapshot: {str(e)}")
+
+    try:
+        refresh_feature_store(conn, data)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error refreshing feature store: {str(e)}")
+
+    try:
+        refresh_indicator_store(conn, data)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error refreshing indicators: {str(e)}")
     finally:
         conn.close()
 
 if __name__ == "__main__":
+    populate_municipios()
     populate_database()
-Traceback (most recent call last):
-  File "<string>", line 5, in <module>
-ModuleNotFoundError: No module named 'pysus'
-Integration with Project
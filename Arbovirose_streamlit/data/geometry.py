@@ -0,0 +1,384 @@
+# Arbovirose_streamlit/data/geometry.py
+import os
+import json
+import heapq
+import logging
+from functools import lru_cache
+
+import numpy as np
+import requests
+
+from config.settings import GEOMETRY_DIR, MUNICIPIOS_GEOJSON_URL
+from data.collector import UF_POR_CODIGO
+
+logger = logging.getLogger(__name__)
+
+# Grade usada para identificar vértices compartilhados na malha original
+QUANTIZACAO_ENTRADA = 1_000_000
+
+KM_POR_GRAU = 111.32
+
+# Níveis de resolução: área efetiva mínima (km², Visvalingam) para manter um
+# vértice e grade de quantização do TopoJSON. 'brasil' é o mapa nacional
+# (arquivo único); 'estado' e 'municipio' são gravados por UF.
+NIVEIS_GEOMETRIA = {
+    "brasil": {"area_minima_km2": 150.0, "quantizacao": 4_000},
+    "estado": {"area_minima_km2": 2.0, "quantizacao": 100_000},
+    "municipio": {"area_minima_km2": 0.05, "quantizacao": 1_000_000},
+}
+
+# Objeto TopoJSON com as geometrias dos municípios
+OBJETO = "municipios"
+
+def load_geojson(fonte=MUNICIPIOS_GEOJSON_URL):
+    """
+    Carrega a malha municipal de uma URL ou de um arquivo local.
+    """
+    if fonte.startswith(("http://", "https://")):
+        response = requests.get(fonte, timeout=120)
+        response.raise_for_status()
+        return response.json()
+    with open(fonte) as f:
+        return json.load(f)
+
+def _poligonos(geometria):
+    """Lista de polígonos (cada um uma lista de anéis sem o ponto de fechamento)"""
+    if geometria["type"] == "Polygon":
+        poligonos = [geometria["coordinates"]]
+    elif geometria["type"] == "MultiPolygon":
+        poligonos = geometria["coordinates"]
+    else:
+        raise ValueError(f"Geometria não suportada: {geometria['type']}")
+    result = []
+    for poligono in poligonos:
+        aneis = []
+        for anel in poligono:
+            coords = np.asarray(anel, dtype="float64")[:, :2]
+            if len(coords) > 1 and np.array_equal(coords[0], coords[-1]):
+                coords = coords[:-1]
+            if len(coords) >= 3:
+                aneis.append(coords)
+        if aneis:
+            result.append(aneis)
+    return result
+
+def _visvalingam(x, y):
+    """
+    Área efetiva de cada vértice (Visvalingam-Whyatt). O peso é mantido
+    monotônico ao longo das remoções, então filtrar por um limiar de área
+    gera níveis aninhados a partir de uma única passada. Extremos recebem inf.
+    """
+    n = len(x)
+    peso = [float("inf")] * n
+    if n < 3:
+        return np.asarray(peso)
+    anterior = list(range(-1, n - 1))
+    proximo = list(range(1, n + 1))
+    atual = [0.0] * n
+
+    def area(i):
+        a, c = anterior[i], proximo[i]
+        return abs((x[i] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[i] - y[a])) / 2
+
+    heap = []
+    for i in range(1, n - 1):
+        atual[i] = area(i)
+        heap.append((atual[i], i))
+    heapq.heapify(heap)
+    removido = [False] * n
+    maior = 0.0
+    while heap:
+        valor, i = heapq.heappop(heap)
+        if removido[i] or valor != atual[i]:
+            continue
+        maior = max(maior, valor)
+        peso[i] = maior
+        removido[i] = True
+        a, c = anterior[i], proximo[i]
+        proximo[a], anterior[c] = c, a
+        for j in (a, c):
+            if 0 < j < n - 1:
+                atual[j] = area(j)
+                heapq.heappush(heap, (atual[j], j))
+    return np.asarray(peso)
+
+class MunicipalTopology:
+    """
+    Topologia da malha municipal: as fronteiras são quebradas em arcos nas
+    junções (vértices onde muda o conjunto de vizinhos) e cada arco
+    compartilhado é guardado uma única vez. A simplificação é feita por
+    arco, então municípios vizinhos continuam encaixados (sem buracos nem
+    sobreposições) em qualquer nível.
+    """
+
+    def __init__(self, geojson, id_field="id", nome_field="name"):
+        """
+        Args:
+            geojson (dict): FeatureCollection com um município por feature
+            id_field (str): propriedade com o código IBGE
+            nome_field (str): propriedade com o nome do município
+        """
+        self.codigos = []
+        self.nomes = []
+        feicoes = []
+        for feature in geojson["features"]:
+            props = feature.get("properties") or {}
+            codigo = feature.get("id", props.get(id_field)) if id_field == "id" else props.get(id_field)
+            self.codigos.append(int(codigo))
+            self.nomes.append(props.get(nome_field))
+            feicoes.append(_poligonos(feature["geometry"]))
+        self.codigos = np.asarray(self.codigos, dtype="int64")
+        self.estados = [UF_POR_CODIGO.get(int(c) // 100000) for c in self.codigos]
+
+        aneis = [anel for poligonos in feicoes for poligono in poligonos for anel in poligono]
+        pontos = np.concatenate(aneis)
+        self._minimo = pontos.min(axis=0)
+        self._escala = (pontos.max(axis=0) - self._minimo) / (QUANTIZACAO_ENTRADA - 1)
+        self._escala[self._escala == 0] = 1.0
+
+        # Vértices iguais na grade de entrada recebem o mesmo identificador
+        grade = np.rint((pontos - self._minimo) / self._escala).astype("int64")
+        _, inverso = np.unique(grade[:, 0] * (QUANTIZACAO_ENTRADA + 1) + grade[:, 1], return_inverse=True)
+        vertices = np.zeros((inverso.max() + 1, 2), dtype="int64")
+        vertices[inverso] = grade
+        self._vertices = vertices
+
+        # Pontos consecutivos que caem no mesmo vértice são descartados; anéis
+        # que ficam com menos de 3 vértices somem
+        ids_aneis = []
+        for ids in np.split(inverso, np.cumsum([len(a) for a in aneis])[:-1]):
+            ids = ids[ids != np.roll(ids, 1)]
+            ids_aneis.append(ids if len(ids) >= 3 else None)
+        validos = [ids for ids in ids_aneis if ids is not None]
+        juncoes = self._juncoes(np.concatenate(validos), np.cumsum([0] + [len(ids) for ids in validos]))
+
+        self._arcos = []
+        indice_arcos = {}
+        self.geometrias = []
+        aneis_ids = iter(ids_aneis)
+        for poligonos in feicoes:
+            geometria = []
+            for poligono in poligonos:
+                ids_poligono = [next(aneis_ids) for _ in poligono]
+                # Sem o anel externo o polígono é descartado
+                if ids_poligono[0] is None:
+                    continue
+                geometria.append([
+                    [self._registrar(arco, indice_arcos) for arco in self._cortar(ids, juncoes)]
+                    for ids in ids_poligono if ids is not None
+                ])
+            self.geometrias.append(geometria)
+
+        self._pesos = []
+        for arco in self._arcos:
+            xy = self._coordenadas(arco)
+            # Longitude escalada pelo cosseno da latitude: áreas aproximadamente em km²
+            cos_lat = np.cos(np.radians(xy[:, 1].mean()))
+            self._pesos.append(_visvalingam(
+                (xy[:, 0] * cos_lat * KM_POR_GRAU).tolist(), (xy[:, 1] * KM_POR_GRAU).tolist()
+            ))
+        self._minimo_interior = self._minimos_por_arco()
+        logger.info(
+            f"Topologia montada: {len(self.codigos)} municípios, {len(self._arcos)} arcos, "
+            f"{len(pontos)} vértices na malha original"
+        )
+
+    @staticmethod
+    def _juncoes(ids, limites):
+        """
+        Marca como junção todo vértice que aparece com mais de um par
+        (anterior, próximo) distinto entre todos os anéis.
+        """
+        n = len(ids)
+        anterior = np.arange(n) - 1
+        proximo = np.arange(n) + 1
+        anterior[limites[:-1]] = limites[1:] - 1
+        proximo[limites[1:] - 1] = limites[:-1]
+        a, b = ids[anterior], ids[proximo]
+        total = ids.max() + 1
+        par = np.minimum(a, b) * total + np.maximum(a, b)
+        distintos = np.unique(np.stack([ids, par], axis=1), axis=0)
+        return np.bincount(distintos[:, 0], minlength=total) > 1
+
+    @staticmethod
+    def _cortar(ids, juncoes):
+        """Quebra um anel nas junções; anéis sem junção viram um arco fechado"""
+        posicoes = np.flatnonzero(juncoes[ids])
+        if len(posicoes) == 0:
+            # Corte canônico no menor identificador, para que o mesmo anel
+            # compartilhado por dois municípios gere o mesmo arco
+            ids = np.roll(ids, -int(np.argmin(ids)))
+            return [np.append(ids, ids[0])]
+        ids = np.roll(ids, -int(posicoes[0]))
+        posicoes = np.append(posicoes - posicoes[0], len(ids))
+        fechado = np.append(ids, ids[0])
+        return [fechado[a:b + 1] for a, b in zip(posicoes[:-1], posicoes[1:])]
+
+    def _registrar(self, arco, indice_arcos):
+        """Índice do arco (ou ~índice se já existe no sentido inverso)"""
+        chave = arco.tobytes()
+        if chave in indice_arcos:
+            return indice_arcos[chave]
+        inverso = arco[::-1].tobytes()
+        if inverso in indice_arcos:
+            return ~indice_arcos[inverso]
+        indice_arcos[chave] = len(self._arcos)
+        self._arcos.append(arco)
+        return indice_arcos[chave]
+
+    def _coordenadas(self, arco):
+        return self._vertices[arco] * self._escala + self._minimo
+
+    def _minimos_por_arco(self):
+        """
+        Vértices internos que cada arco precisa manter para que nenhum anel
+        degenere: 2 para anéis de um arco só, 1 para anéis de dois arcos.
+        """
+        minimo = np.zeros(len(self._arcos), dtype="int64")
+        for geometria in self.geometrias:
+            for poligono in geometria:
+                for anel in poligono:
+                    if len(anel) <= 2:
+                        for ref in anel:
+                            i = ref if ref >= 0 else ~ref
+                            minimo[i] = max(minimo[i], 3 - len(anel))
+        return minimo
+
+    def _simplificar(self, i, area_minima):
+        peso = self._pesos[i]
+        manter = peso >= area_minima
+        faltam = self._minimo_interior[i] - (manter.sum() - 2)
+        if faltam > 0 and len(peso) > 2:
+            interiores = np.argsort(peso[1:-1])[::-1][:self._minimo_interior[i]] + 1
+            manter[interiores] = True
+        return self._coordenadas(self._arcos[i][manter])
+
+    def to_topojson(self, area_minima_km2, quantizacao, estado=None):
+        """
+        Gera um TopoJSON quantizado e com arcos em delta, no nível pedido.
+
+        Args:
+            area_minima_km2 (float): área efetiva mínima para manter um vértice
+            quantizacao (int): tamanho da grade de coordenadas inteiras
+            estado (str): se informado, só os municípios dessa UF
+
+        Returns:
+            dict: TopoJSON com o objeto 'municipios' (id = código IBGE, propriedade 'nome')
+        """
+        selecionados = [i for i, uf in enumerate(self.estados) if estado is None or uf == estado]
+        usados = {}
+        for g in selecionados:
+            for poligono in self.geometrias[g]:
+                for anel in poligono:
+                    for ref in anel:
+                        i = ref if ref >= 0 else ~ref
+                        usados.setdefault(i, len(usados))
+
+        arcos = [self._simplificar(i, area_minima_km2) for i in usados]
+        if not arcos:
+            return {"type": "Topology", "objects": {OBJETO: {"type": "GeometryCollection", "geometries": []}}, "arcs": []}
+        pontos = np.concatenate(arcos)
+        translate = pontos.min(axis=0)
+        scale = (pontos.max(axis=0) - translate) / (quantizacao - 1)
+        scale[scale == 0] = 1.0
+
+        arcos_json = []
+        for xy in arcos:
+            q = np.rint((xy - translate) / scale).astype("int64")
+            # Pontos que caem na mesma célula da grade são redundantes (extremos ficam)
+            manter = np.ones(len(q), dtype=bool)
+            manter[1:-1] = np.any(q[1:-1] != q[:-2], axis=1) & np.any(q[1:-1] != q[-1], axis=1)
+            if len(q) > 2 and np.array_equal(q[0], q[-1]) and manter.sum() < 4:
+                manter[:] = True
+            q = q[manter]
+            arcos_json.append(np.vstack([q[:1], np.diff(q, axis=0)]).tolist())
+
+        def remapear(ref):
+            return usados[ref] if ref >= 0 else ~usados[~ref]
+
+        geometrias = []
+        for g in selecionados:
+            poligonos = [[[remapear(ref) for ref in anel] for anel in poligono] for poligono in self.geometrias[g]]
+            geometrias.append({
+                "type": "Polygon" if len(poligonos) == 1 else "MultiPolygon",
+                "id": int(self.codigos[g]),
+                "properties": {"nome": self.nomes[g]},
+                "arcs": poligonos[0] if len(poligonos) == 1 else poligonos,
+            })
+        return {
+            "type": "Topology",
+            "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+            "objects": {OBJETO: {"type": "GeometryCollection", "geometries": geometrias}},
+            "arcs": arcos_json,
+        }
+
+def _topology_path(nivel, estado=None, path=GEOMETRY_DIR):
+    if nivel == "brasil":
+        return os.path.join(path, "brasil.topo.json")
+    return os.path.join(path, nivel, f"{estado}.topo.json")
+
+def _write_json(dados, arquivo):
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    tmp = f"{arquivo}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(dados, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp, arquivo)
+    return os.path.getsize(arquivo)
+
+def build_geometry_levels(fonte=MUNICIPIOS_GEOJSON_URL, path=GEOMETRY_DIR, niveis=NIVEIS_GEOMETRIA):
+    """
+    Gera todos os níveis de resolução a partir da malha original.
+
+    Returns:
+        dict: bytes gravados por arquivo
+    """
+    topologia = MunicipalTopology(load_geojson(fonte))
+    tamanhos = {}
+    for nivel, parametros in niveis.items():
+        estados = [None] if nivel == "brasil" else sorted({uf for uf in topologia.estados if uf})
+        for estado in estados:
+            arquivo = _topology_path(nivel, estado, path)
+            tamanhos[arquivo] = _write_json(topologia.to_topojson(estado=estado, **parametros), arquivo)
+        logger.info(f"Nível '{nivel}' gerado ({len(estados)} arquivo(s))")
+
+    nacional = tamanhos[_topology_path("brasil", path=path)]
+    if nacional > 1024 * 1024:
+        logger.warning(f"Mapa nacional com {nacional / 1024:.0f} KB; considere aumentar area_minima_km2")
+    return tamanhos
+
+def choose_level(estado=None, municipio=None, zoom=None):
+    """
+    Nível de resolução para o recorte ou zoom atual do mapa.
+
+    Sem UF no escopo só o arquivo nacional cobre o mapa inteiro. Dentro de
+    uma UF, o nível 'municipio' é usado ao focar um município ou quando o
+    zoom do mapa (escala do Leaflet) passa de 8.
+    """
+    if not estado:
+        return "brasil"
+    if municipio or (zoom is not None and zoom > 8):
+        return "municipio"
+    return "estado"
+
+@lru_cache(maxsize=32)
+def _load_topology(arquivo, mtime):
+    with open(arquivo) as f:
+        return json.load(f)
+
+def load_topology(nivel, estado=None, path=GEOMETRY_DIR):
+    """
+    TopoJSON de um nível (e UF, fora do nível 'brasil'), mantido em memória
+    até o arquivo ser regravado. Retorna None se o nível não foi gerado.
+    """
+    arquivo = _topology_path(nivel, estado, path)
+    try:
+        mtime = os.stat(arquivo).st_mtime_ns
+    except FileNotFoundError:
+        logger.warning(f"Geometrias não encontradas: {arquivo}")
+        return None
+    return _load_topology(arquivo, mtime)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for arquivo, tamanho in build_geometry_levels().items():
+        logger.info(f"{arquivo}: {tamanho / 1024:.0f} KB")
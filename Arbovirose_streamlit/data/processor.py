@@ -0,0 +1,567 @@
+# Arbovirose_streamlit/data/processor.py
+import os
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy.stats import gamma
+
+from config.settings import FEATURE_STORE_DIR, INDICATORS_DIR
+from data.storage import load_epi_data, load_municipios
+from data.spatial import MunicipalityIndex, neighbor_weights
+
+logger = logging.getLogger(__name__)
+
+# Features guardadas no feature store, na ordem do último eixo dos arrays
+FEATURES = [
+    "casos",
+    "casos_lag1",
+    "casos_lag2",
+    "casos_lag4",
+    "soma_4s",
+    "media_8s",
+    "sazonal_sen",
+    "sazonal_cos",
+    "vizinhos_soma",
+]
+
+# Semanas de histórico necessárias para calcular as features de uma semana
+HISTORICO_SEMANAS = 8
+
+# Indicadores epidemiológicos semanais, na ordem do último eixo do store
+INDICADORES = [
+    "casos",
+    "incidencia_100k",
+    "casos_mm4",
+    "incidencia_mm4",
+    "rt",
+    "rt_inferior",
+    "rt_superior",
+]
+
+# Janela (semanas) das médias móveis
+JANELA_MEDIA_MOVEL = 4
+
+# Rt (Cori et al., 2013): janela de suavização em semanas, priori gama
+# (forma, escala) e intervalo serial da dengue em semanas (gama discretizada)
+JANELA_RT = 3
+RT_PRIORI = (1.0, 5.0)
+INTERVALO_SERIAL_MEDIA = 3.0
+INTERVALO_SERIAL_DESVIO = 1.0
+INTERVALO_SERIAL_MAX = 6
+
+def attach_codigo_ibge(data, municipios):
+    """
+    Adiciona a coluna 'codigo_ibge' aos dados de casos, casando
+    (estado, municipio) com a tabela municipios sem diferenciar
+    maiúsculas/minúsculas. Linhas sem correspondência ficam com NA.
+    """
+    if "codigo_ibge" in data.columns:
+        return data
+    chave = pd.DataFrame({
+        "_estado": municipios["estado"].astype("string").str.upper(),
+        "_nome": municipios["nome"].astype("string").str.strip().str.casefold(),
+        "codigo_ibge": municipios["codigo_ibge"].astype("Int64"),
+    }).drop_duplicates(subset=["_estado", "_nome"])
+    result = data.assign(
+        _estado=data["estado"].astype("string").str.upper(),
+        _nome=data["municipio"].astype("string").str.strip().str.casefold(),
+    ).merge(chave, on=["_estado", "_nome"], how="left")
+    result.index = data.index
+    return result.drop(columns=["_estado", "_nome"])
+
+def week_start(datas):
+    """
+    Início (domingo) da semana epidemiológica de cada data.
+    """
+    datas = pd.to_datetime(datas)
+    return (datas - pd.to_timedelta((datas.dt.dayofweek + 1) % 7, unit="D")).dt.normalize()
+
+def weekly_case_matrix(data, codigos, inicio=None):
+    """
+    Agrega os casos em uma matriz semana × município.
+
+    Args:
+        data (pd.DataFrame): colunas 'codigo_ibge', 'data' e 'casos_confirmados'
+        codigos (array): ordem das colunas (códigos IBGE)
+        inicio (pd.Timestamp): primeira semana da matriz; por padrão a mais antiga dos dados
+
+    Returns:
+        pd.DataFrame: índice com o domingo de cada semana (sem lacunas), uma coluna por município
+    """
+    data = data.dropna(subset=["codigo_ibge"])
+    semanas = week_start(data["data"])
+    matriz = (
+        data.assign(semana=semanas.to_numpy(), codigo_ibge=data["codigo_ibge"].astype("int64"))
+        .pivot_table(index="semana", columns="codigo_ibge", values="casos_confirmados", aggfunc="sum")
+    )
+    if matriz.empty:
+        return pd.DataFrame(columns=codigos, dtype="float64")
+    inicio = matriz.index.min() if inicio is None else pd.Timestamp(inicio)
+    todas = pd.date_range(inicio, max(matriz.index.max(), inicio), freq="7D")
+    return matriz.reindex(index=todas, columns=codigos, fill_value=0).fillna(0)
+
+class FeatureStore:
+    """
+    Feature store em disco com arrays densos (semana × município × feature).
+
+    Os dados ficam em 'features-<versão>.f32' (float32, semana no eixo
+    mais externo) e os metadados, com o nome do arquivo atual, em
+    'meta.json'. Leitores abrem o arquivo com np.memmap e recebem views sem
+    cópia. Um arquivo publicado nunca é alterado: cada gravação escreve um
+    arquivo novo e só então troca os metadados atomicamente, então trainer,
+    predictor e reconciliação que mapeiam a versão anterior nunca veem
+    fatias pela metade (nem SIGBUS por truncamento), mesmo com os jobs
+    diário e semanal sobrepostos.
+    """
+
+    DATA_PREFIX = "features"
+    META_FILE = "meta.json"
+
+    def __init__(self, path=FEATURE_STORE_DIR):
+        self.path = path
+        self.codigos = np.array([], dtype="int64")
+        self.semanas = []
+        self.features = list(FEATURES)
+        self.data_file = None
+        meta_path = os.path.join(path, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.codigos = np.asarray(meta["codigos"], dtype="int64")
+            self.semanas = [pd.Timestamp(s) for s in meta["semanas"]]
+            self.features = meta["features"]
+            self.data_file = meta.get("arquivo", "features.f32")
+
+    @classmethod
+    def create(cls, codigos, path=FEATURE_STORE_DIR, features=FEATURES):
+        """
+        Cria (ou recria) um feature store vazio para a lista de municípios.
+        O mesmo formato guarda outras séries semanais (ex.: os indicadores,
+        passando INDICADORES em 'features').
+        """
+        os.makedirs(path, exist_ok=True)
+        store = cls.__new__(cls)
+        store.path = path
+        store.codigos = np.asarray(codigos, dtype="int64")
+        store.semanas = []
+        store.features = list(features)
+        store.data_file = store._new_data_file()
+        open(os.path.join(path, store.data_file), "wb").close()
+        store._write_meta()
+        store._remove_old_files()
+        return store
+
+    def __len__(self):
+        return len(self.semanas)
+
+    @property
+    def shape(self):
+        return (len(self.semanas), len(self.codigos), len(self.features))
+
+    @property
+    def ultima_semana(self):
+        return self.semanas[-1] if self.semanas else None
+
+    def _write_meta(self):
+        meta = {
+            "codigos": self.codigos.tolist(),
+            "semanas": [s.strftime("%Y-%m-%d") for s in self.semanas],
+            "features": self.features,
+            "arquivo": self.data_file,
+        }
+        tmp_path = os.path.join(self.path, self.META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, self.META_FILE))
+
+    def array(self, mode="r"):
+        """
+        Array (semana × município × feature) mapeado em memória.
+        Somente leitura por padrão; retorna um array vazio se não houver semanas.
+        """
+        if not self.semanas:
+            return np.empty(self.shape, dtype=np.float32)
+        return np.memmap(os.path.join(self.path, self.data_file), dtype=np.float32, mode=mode, shape=self.shape)
+
+    def por_municipio(self):
+        """View (município × semana × feature) do mesmo array, sem cópia"""
+        return self.array().transpose(1, 0, 2)
+
+    def feature(self, nome):
+        """View (semana × município) de uma feature, sem cópia"""
+        return self.array()[:, :, self.features.index(nome)]
+
+    def _new_data_file(self):
+        return f"{self.DATA_PREFIX}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.f32"
+
+    def _remove_old_files(self, manter=2):
+        """
+        Remove arquivos de dados antigos, mantendo os 'manter' mais recentes:
+        quem leu o meta.json anterior ainda consegue abrir o arquivo dele, e
+        mapeamentos já abertos continuam válidos após a remoção (POSIX).
+        """
+        # O arquivo único de versões antigas (features.f32) é o mais antigo
+        arquivos = sorted(
+            (nome for nome in os.listdir(self.path)
+             if nome.startswith(self.DATA_PREFIX) and nome.endswith(".f32")),
+            key=lambda nome: (nome != f"{self.DATA_PREFIX}.f32", nome)
+        )
+        for antigo in arquivos[:-manter]:
+            if antigo != self.data_file:
+                os.remove(os.path.join(self.path, antigo))
+
+    def write_weeks(self, posicao, fatias, semanas):
+        """
+        Grava fatias (semana × município × feature) a partir da posição
+        informada. Semanas já existentes são substituídas, as novas são
+        anexadas, e os dados terminam na última fatia gravada.
+
+        O prefixo inalterado é copiado para um arquivo novo, as fatias são
+        escritas depois dele e o meta.json passa a apontar para o novo
+        arquivo; o arquivo anterior não é tocado.
+        """
+        fatias = np.ascontiguousarray(fatias, dtype=np.float32)
+        bytes_por_semana = len(self.codigos) * len(self.features) * fatias.itemsize
+        novo = self._new_data_file()
+        with open(os.path.join(self.path, novo), "wb") as destino:
+            if posicao and self.data_file:
+                with open(os.path.join(self.path, self.data_file), "rb") as origem:
+                    restante = posicao * bytes_por_semana
+                    while restante:
+                        bloco = origem.read(min(restante, 64 * 1024 * 1024))
+                        if not bloco:
+                            raise ValueError(f"Arquivo {self.data_file} menor que {posicao} semanas")
+                        destino.write(bloco)
+                        restante -= len(bloco)
+            destino.write(fatias.tobytes())
+            destino.flush()
+            os.fsync(destino.fileno())
+        self.data_file = novo
+        self.semanas = self.semanas[:posicao] + list(semanas)
+        self._write_meta()
+        self._remove_old_files()
+
+def compute_week_features(historico, casos, semana, vizinhos=None):
+    """
+    Features de uma semana para todos os municípios.
+
+    Args:
+        historico (np.ndarray): casos das semanas anteriores (semana × município),
+            a mais recente por último; até HISTORICO_SEMANAS linhas
+        casos (np.ndarray): casos da semana (um valor por município)
+        semana (pd.Timestamp): início da semana
+        vizinhos (tuple): (indices, pesos) de MunicipalityIndex.knn_arrays/neighbor_weights
+
+    Returns:
+        np.ndarray: matriz (município × feature) na ordem de FEATURES
+    """
+    n = len(casos)
+    janela = np.vstack([historico[-(HISTORICO_SEMANAS - 1):], casos[None, :]]) if len(historico) else casos[None, :]
+
+    def lag(k):
+        return historico[-k] if len(historico) >= k else np.zeros(n)
+
+    angulo = 2 * np.pi * semana.dayofyear / 365.25
+    if vizinhos is not None:
+        indices, pesos = vizinhos
+        vizinhos_soma = (casos[indices] * pesos).sum(axis=1)
+    else:
+        vizinhos_soma = np.zeros(n)
+    return np.column_stack([
+        casos,
+        lag(1),
+        lag(2),
+        lag(4),
+        janela[-4:].sum(axis=0),
+        janela.mean(axis=0),
+        np.full(n, np.sin(angulo)),
+        np.full(n, np.cos(angulo)),
+        vizinhos_soma,
+    ])
+
+def update_feature_store(store, data, vizinhos=None, semanas_revisao=4):
+    """
+    Atualiza o feature store de forma incremental.
+
+    Só são calculadas as semanas posteriores à última do store, mais as
+    últimas 'semanas_revisao' já gravadas (reescritas no lugar, pois as
+    notificações recentes costumam ser revisadas). O histórico necessário
+    para lags e janelas vem do próprio store.
+
+    Args:
+        store (FeatureStore): feature store aberto
+        data (pd.DataFrame): casos com 'codigo_ibge', 'data' e 'casos_confirmados'
+        vizinhos (tuple): (indices, pesos) alinhados a store.codigos
+        semanas_revisao (int): semanas finais recalculadas mesmo já existindo
+
+    Returns:
+        int: número de semanas calculadas
+    """
+    posicao = max(0, len(store) - semanas_revisao)
+    inicio = store.semanas[posicao] if posicao < len(store) else None
+    if inicio is None and len(store):
+        inicio = store.ultima_semana + pd.Timedelta(weeks=1)
+
+    recentes = data
+    if inicio is not None:
+        recentes = data[pd.to_datetime(data["data"]) >= inicio]
+    matriz = weekly_case_matrix(recentes, store.codigos, inicio=inicio)
+    if matriz.empty:
+        logger.info("Feature store já atualizado")
+        return 0
+
+    historico = store.feature("casos")[max(0, posicao - HISTORICO_SEMANAS):posicao]
+    historico = np.asarray(historico, dtype="float64")
+    fatias = []
+    for semana, casos in zip(matriz.index, matriz.to_numpy(dtype="float64")):
+        fatias.append(compute_week_features(historico, casos, semana, vizinhos))
+        historico = np.vstack([historico, casos[None, :]])[-HISTORICO_SEMANAS:]
+
+    store.write_weeks(posicao, np.stack(fatias), matriz.index)
+    logger.info(f"Feature store atualizado: {len(fatias)} semanas a partir de {matriz.index[0].date()}")
+    return len(fatias)
+
+def refresh_feature_store(conn, data, path=FEATURE_STORE_DIR, recriar=False, historico=None):
+    """
+    Atualiza o feature store com os dados recém-carregados em epi_data.
+
+    O eixo de municípios segue o índice espacial (municípios com
+    coordenadas); se a lista mudar, o store é recriado do zero. 'recriar'
+    força isso quando 'data' traz semanas anteriores às do store (backfill).
+    Ao recriar, as features saem de epi_data inteira, não só do lote.
+
+    Args:
+        conn: conexão aberta (connect)
+        data (pd.DataFrame): lote recém-gravado em epi_data
+        path (str): diretório do feature store
+        recriar (bool): recria o store mesmo sem mudança de municípios
+        historico (pd.DataFrame): epi_data inteira, se o chamador já a
+            carregou (evita reler a tabela ao recriar)
+
+    Returns:
+        int: número de semanas calculadas
+    """
+    municipios = load_municipios(conn)
+    if municipios.empty:
+        logger.warning("Tabela municipios vazia; feature store não atualizado")
+        return 0
+
+    vizinhos = None
+    codigos = municipios["codigo_ibge"].to_numpy(dtype="int64")
+    if municipios[["latitude", "longitude"]].notna().all(axis=1).sum() > 1:
+        index = MunicipalityIndex(municipios)
+        codigos = index.codigos
+        indices, distancias = index.knn_arrays()
+        vizinhos = (indices, neighbor_weights(distancias))
+
+    store = FeatureStore(path)
+    if recriar or not np.array_equal(store.codigos, codigos):
+        logger.info("Lista de municípios mudou ou recriação pedida; recriando feature store")
+        store = FeatureStore.create(codigos, path)
+        # O lote do job diário cobre só o período baixado; o histórico vem da tabela
+        data = load_epi_data(conn) if historico is None else historico
+    return update_feature_store(store, attach_codigo_ibge(data, municipios), vizinhos)
+
+def serial_interval_weights(media=INTERVALO_SERIAL_MEDIA, desvio=INTERVALO_SERIAL_DESVIO,
+                            max_semanas=INTERVALO_SERIAL_MAX):
+    """
+    Distribuição do intervalo serial discretizada por semana.
+
+    Returns:
+        np.ndarray: pesos w[k-1] para k = 1..max_semanas, somando 1
+    """
+    forma, escala = (media / desvio) ** 2, desvio ** 2 / media
+    limites = np.arange(max_semanas + 1) + 0.5
+    pesos = np.diff(gamma.cdf(limites, forma, scale=escala))
+    return pesos / pesos.sum()
+
+def _window_sums(matriz, janela):
+    """Somas móveis (janela parcial no início) ao longo do eixo das semanas"""
+    acumulado = np.vstack([np.zeros((1, matriz.shape[1])), np.cumsum(matriz, axis=0)])
+    fim = np.arange(1, len(matriz) + 1)
+    return acumulado[fim] - acumulado[np.maximum(fim - janela, 0)], np.minimum(fim, janela)
+
+def moving_average(matriz, janela=JANELA_MEDIA_MOVEL):
+    """
+    Média móvel (semana × município) das últimas 'janela' semanas; nas
+    primeiras semanas usa as disponíveis.
+    """
+    somas, contagem = _window_sums(matriz, janela)
+    return somas / contagem[:, None]
+
+def infectiousness(casos, pesos):
+    """
+    Pressão de infecção Λ_t = Σ_k w_k · casos_{t-k} para todos os municípios.
+    """
+    pressao = np.zeros_like(casos, dtype="float64")
+    for k, w in enumerate(pesos, start=1):
+        pressao[k:] += w * casos[:-k]
+    return pressao
+
+def estimate_rt(casos, pesos=None, janela=JANELA_RT, priori=RT_PRIORI, nivel=0.95):
+    """
+    Número de reprodução efetivo (Cori et al., 2013) de todos os municípios.
+
+    A posteriori de Rt na semana t é gama com forma a + Σ casos e taxa
+    1/b + Σ Λ, somando nas últimas 'janela' semanas. Semanas sem pressão de
+    infecção (Λ = 0 na janela) ficam com NaN.
+
+    Args:
+        casos (np.ndarray): matriz semana × município
+        pesos (np.ndarray): intervalo serial (ver serial_interval_weights)
+        janela (int): semanas da janela de suavização
+        priori (tuple): (forma, escala) da priori gama
+        nivel (float): nível do intervalo de credibilidade
+
+    Returns:
+        tuple: (media, inferior, superior), cada um semana × município
+    """
+    pesos = serial_interval_weights() if pesos is None else pesos
+    forma_priori, escala_priori = priori
+    soma_casos, _ = _window_sums(casos, janela)
+    soma_pressao, _ = _window_sums(infectiousness(casos, pesos), janela)
+
+    forma = forma_priori + soma_casos
+    with np.errstate(divide="ignore"):
+        escala = np.where(soma_pressao > 0, 1.0 / (1.0 / escala_priori + soma_pressao), np.nan)
+    cauda = (1 - nivel) / 2
+    return (
+        forma * escala,
+        gamma.ppf(cauda, forma, scale=escala),
+        gamma.ppf(1 - cauda, forma, scale=escala),
+    )
+
+def compute_indicators(casos, populacao):
+    """
+    Indicadores de todas as semanas e municípios em operações de matriz.
+
+    Args:
+        casos (np.ndarray): matriz semana × município
+        populacao (np.ndarray): população de cada município (NaN se desconhecida)
+
+    Returns:
+        np.ndarray: array (semana × município × indicador) na ordem de INDICADORES
+    """
+    casos = np.asarray(casos, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        por_100k = np.where(populacao > 0, 1e5 / populacao, np.nan)
+    incidencia = casos * por_100k
+    rt, rt_inferior, rt_superior = estimate_rt(casos)
+    return np.stack([
+        casos,
+        incidencia,
+        moving_average(casos),
+        moving_average(casos) * por_100k,
+        rt,
+        rt_inferior,
+        rt_superior,
+    ], axis=-1)
+
+def indicator_history_weeks():
+    """Semanas anteriores necessárias para recalcular uma semana sem perda"""
+    return max(JANELA_MEDIA_MOVEL - 1, INTERVALO_SERIAL_MAX + JANELA_RT - 1)
+
+def update_indicator_store(store, data, populacao, semanas_revisao=4):
+    """
+    Atualiza os indicadores de forma incremental, como update_feature_store:
+    só as semanas novas e as últimas 'semanas_revisao' são recalculadas, com
+    o histórico de casos lido do próprio store.
+
+    Args:
+        store (FeatureStore): store de indicadores (features = INDICADORES)
+        data (pd.DataFrame): casos com 'codigo_ibge', 'data' e 'casos_confirmados'
+        populacao (np.ndarray): população alinhada a store.codigos
+        semanas_revisao (int): semanas finais recalculadas mesmo já existindo
+
+    Returns:
+        int: número de semanas calculadas
+    """
+    posicao = max(0, len(store) - semanas_revisao)
+    inicio = store.semanas[posicao] if posicao < len(store) else None
+    if inicio is None and len(store):
+        inicio = store.ultima_semana + pd.Timedelta(weeks=1)
+
+    recentes = data
+    if inicio is not None:
+        recentes = data[pd.to_datetime(data["data"]) >= inicio]
+    matriz = weekly_case_matrix(recentes, store.codigos, inicio=inicio)
+    if matriz.empty:
+        logger.info("Indicadores já atualizados")
+        return 0
+
+    historico = np.asarray(store.feature("casos")[max(0, posicao - indicator_history_weeks()):posicao], dtype="float64")
+    casos = np.vstack([historico, matriz.to_numpy(dtype="float64")])
+    indicadores = compute_indicators(casos, populacao)[len(historico):]
+
+    store.write_weeks(posicao, indicadores, matriz.index)
+    logger.info(f"Indicadores atualizados: {len(matriz)} semanas a partir de {matriz.index[0].date()}")
+    return len(matriz)
+
+def refresh_indicator_store(conn, data, path=INDICATORS_DIR, recriar=False, historico=None):
+    """
+    Atualiza os indicadores com os dados recém-carregados em epi_data.
+
+    O eixo de municípios segue a tabela municipios, junto com a população.
+    Se a lista de municípios ou a população mudar, o store é recriado e
+    toda a série é recalculada a partir de epi_data inteira, assim como
+    com 'recriar' (backfill).
+
+    Args:
+        conn: conexão aberta (connect)
+        data (pd.DataFrame): lote recém-gravado em epi_data
+        path (str): diretório dos indicadores
+        recriar (bool): recria o store mesmo sem mudança de municípios ou população
+        historico (pd.DataFrame): epi_data inteira, se o chamador já a
+            carregou (evita reler a tabela ao recriar)
+
+    Returns:
+        int: número de semanas calculadas
+    """
+    municipios = load_municipios(conn)
+    if municipios.empty:
+        logger.warning("Tabela municipios vazia; indicadores não atualizados")
+        return 0
+    codigos = municipios["codigo_ibge"].to_numpy(dtype="int64")
+    populacao = pd.to_numeric(municipios["populacao"], errors="coerce").to_numpy(dtype="float64")
+    if np.isnan(populacao).all():
+        logger.warning("População desconhecida; incidência ficará vazia (carregue a população em municipios)")
+
+    store = FeatureStore(path)
+    arquivo_populacao = os.path.join(path, "populacao.npy")
+    populacao_atual = np.load(arquivo_populacao) if os.path.exists(arquivo_populacao) else None
+    if (
+        recriar
+        or not np.array_equal(store.codigos, codigos)
+        or store.features != INDICADORES
+        or populacao_atual is None
+        or not np.array_equal(populacao_atual, populacao, equal_nan=True)
+    ):
+        logger.info("Municípios ou população mudaram; recriando indicadores")
+        store = FeatureStore.create(codigos, path, features=INDICADORES)
+        np.save(arquivo_populacao, populacao)
+        data = load_epi_data(conn) if historico is None else historico
+    return update_indicator_store(store, attach_codigo_ibge(data, municipios), populacao)
+
+def indicators_frame(store, semana=-1, municipios=None):
+    """
+    Indicadores de uma semana (por padrão a mais recente) por município.
+
+    Args:
+        store (FeatureStore): store de indicadores
+        semana (int): posição da semana no store
+        municipios (pd.DataFrame): se informado, acrescenta nome e estado
+
+    Returns:
+        pd.DataFrame: índice codigo_ibge, uma coluna por indicador
+    """
+    if not len(store):
+        return pd.DataFrame(columns=INDICADORES, index=pd.Index([], name="codigo_ibge"), dtype="float64")
+    result = pd.DataFrame(store.array()[semana], columns=store.features,
+                          index=pd.Index(store.codigos, name="codigo_ibge"))
+    if municipios is not None:
+        referencia = municipios.set_index("codigo_ibge")[["nome", "estado"]]
+        result = referencia.reindex(result.index).join(result)
+    return result
@@ -0,0 +1,201 @@
+# Arbovirose_streamlit/data/snapshot.py
+import os
+import json
+import shutil
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config.settings import SNAPSHOT_DIR
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+
+def publish_snapshot(data, path=SNAPSHOT_DIR, manter=2):
+    """
+    Publica um snapshot colunar, somente leitura, do conjunto de dados atual.
+
+    Cada coluna vira um arquivo .npy (texto é codificado como dicionário:
+    códigos int32 + lista de categorias). O snapshot é escrito em um
+    diretório temporário, renomeado para o nome da versão e só então o
+    arquivo CURRENT passa a apontar para ele (os.replace é atômico), de
+    modo que leitores nunca enxergam um snapshot incompleto.
+
+    Args:
+        data (pd.DataFrame): colunas 'estado', 'municipio', 'data' e 'casos_confirmados'
+        path (str): diretório raiz dos snapshots
+        manter (int): quantas versões antigas manter no disco
+
+    Returns:
+        str: identificador da versão publicada
+    """
+    os.makedirs(path, exist_ok=True)
+    versao = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    tmp_dir = os.path.join(path, f".tmp-{versao}")
+    os.makedirs(tmp_dir)
+
+    data = data.sort_values(["estado", "municipio", "data"]).reset_index(drop=True)
+    colunas = {}
+    data_max = None
+    for nome in data.columns:
+        coluna = data[nome]
+        if nome == "data":
+            valores = pd.to_datetime(coluna).to_numpy(dtype="datetime64[D]")
+            np.save(os.path.join(tmp_dir, f"{nome}.npy"), valores)
+            colunas[nome] = {"tipo": "data"}
+            data_max = str(valores.max()) if len(valores) else None
+        elif pd.api.types.is_numeric_dtype(coluna):
+            np.save(os.path.join(tmp_dir, f"{nome}.npy"), coluna.to_numpy())
+            colunas[nome] = {"tipo": "numero"}
+        else:
+            codigos, categorias = pd.factorize(coluna)
+            np.save(os.path.join(tmp_dir, f"{nome}.npy"), codigos.astype(np.int32))
+            colunas[nome] = {"tipo": "categoria", "categorias": [str(c) for c in categorias]}
+
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump({"versao": versao, "linhas": len(data), "data_max": data_max, "colunas": colunas}, f)
+    os.rename(tmp_dir, os.path.join(path, versao))
+
+    tmp_current = os.path.join(path, CURRENT_FILE + ".tmp")
+    with open(tmp_current, "w") as f:
+        f.write(versao)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, os.path.join(path, CURRENT_FILE))
+    logger.info(f"Snapshot {versao} publicado com {len(data)} registros")
+
+    # Leitores que ainda mapeiam versões removidas continuam válidos (POSIX)
+    versoes = sorted(d for d in os.listdir(path) if not d.startswith(".") and d != CURRENT_FILE)
+    for antiga in versoes[:-manter]:
+        shutil.rmtree(os.path.join(path, antiga), ignore_errors=True)
+    return versao
+
+def current_version(path=SNAPSHOT_DIR):
+    """
+    Versão apontada por CURRENT, ou None se nenhum snapshot foi publicado.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+class Snapshot:
+    """
+    Uma versão publicada, com cada coluna mapeada em memória (mmap).
+
+    Vários processos que abrem a mesma versão compartilham as mesmas páginas
+    do cache do sistema operacional; nada é copiado até a materialização das
+    linhas filtradas.
+    """
+
+    def __init__(self, path, versao):
+        self.versao = versao
+        diretorio = os.path.join(path, versao)
+        with open(os.path.join(diretorio, META_FILE)) as f:
+            meta = json.load(f)
+        self.linhas = meta["linhas"]
+        self.data_max = meta["data_max"]
+        self.colunas = {}
+        self.categorias = {}
+        for nome, info in meta["colunas"].items():
+            self.colunas[nome] = np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode="r")
+            if info["tipo"] == "categoria":
+                self.categorias[nome] = np.asarray(info["categorias"], dtype=object)
+
+    def __len__(self):
+        return self.linhas
+
+    def _posicao(self, nome, valor):
+        posicoes = np.flatnonzero(self.categorias[nome] == valor)
+        return posicoes[0] if len(posicoes) else None
+
+    def query(self, estado=None, municipio=None, inicio=None, fim=None, dias=None):
+        """
+        Filtra o snapshot com máscaras vetorizadas sobre as colunas mapeadas.
+
+        Args:
+            estado (str): sigla da UF
+            municipio (str): nome do município
+            inicio (str): data inicial (inclusiva, ISO)
+            fim (str): data final (inclusiva, ISO)
+            dias (int): últimos N dias até a data mais recente do snapshot
+
+        Returns:
+            pd.DataFrame: linhas selecionadas, com 'data' em formato ISO
+        """
+        # As linhas são publicadas ordenadas por estado, então os códigos de
+        # estado são crescentes e o bloco de uma UF sai de uma busca binária.
+        inicio_bloco, fim_bloco = 0, self.linhas
+        if estado:
+            codigo = self._posicao("estado", estado.upper())
+            if codigo is None:
+                inicio_bloco = fim_bloco = 0
+            else:
+                codigos = self.colunas["estado"]
+                inicio_bloco = int(np.searchsorted(codigos, codigo, side="left"))
+                fim_bloco = int(np.searchsorted(codigos, codigo, side="right"))
+
+        mask = np.ones(fim_bloco - inicio_bloco, dtype=bool)
+        if municipio:
+            codigo = self._posicao("municipio", municipio)
+            mask &= self.colunas["municipio"][inicio_bloco:fim_bloco] == (-2 if codigo is None else codigo)
+        if dias and self.data_max:
+            inicio = str(np.datetime64(self.data_max, "D") - np.timedelta64(int(dias), "D"))
+        datas = self.colunas["data"][inicio_bloco:fim_bloco]
+        if inicio:
+            mask &= datas >= np.datetime64(inicio, "D")
+        if fim:
+            mask &= datas <= np.datetime64(fim, "D")
+
+        indices = inicio_bloco + np.flatnonzero(mask)
+        result = {}
+        for nome, coluna in self.colunas.items():
+            valores = coluna[indices]
+            if nome in self.categorias:
+                valores = self.categorias[nome][valores]
+            elif nome == "data":
+                valores = np.datetime_as_string(valores, unit="D")
+            result[nome] = valores
+        return pd.DataFrame(result)
+
+class SnapshotReader:
+    """
+    Mantém o snapshot atual de um processo e troca para a nova versão assim
+    que o job de ingestão publica outra, sem reiniciar o worker.
+
+    A checagem é um stat() no arquivo CURRENT por chamada; leituras nunca
+    bloqueiam o escritor, que só cria arquivos novos e troca o ponteiro.
+    """
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+        self._snapshot = None
+        self._assinatura = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """
+        Snapshot atual, ou None se nenhum foi publicado ainda.
+        """
+        try:
+            stat = os.stat(os.path.join(self.path, CURRENT_FILE))
+        except FileNotFoundError:
+            return self._snapshot
+        assinatura = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if assinatura == self._assinatura:
+            return self._snapshot
+
+        with self._lock:
+            if assinatura != self._assinatura:
+                versao = current_version(self.path)
+                if versao and (self._snapshot is None or versao != self._snapshot.versao):
+                    self._snapshot = Snapshot(self.path, versao)
+                    logger.info(f"Snapshot {versao} carregado ({len(self._snapshot)} registros)")
+                self._assinatura = assinatura
+        return self._snapshot
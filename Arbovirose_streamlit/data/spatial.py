@@ -0,0 +1,195 @@
+# Arbovirose_streamlit/data/spatial.py
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from data.storage import create_vizinhos_table, load_municipios, save_vizinhos
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Número de vizinhos guardados por município na tabela municipios_vizinhos
+DEFAULT_K = 8
+
+def _unit_vectors(latitude, longitude):
+    """Converte latitude/longitude (graus) em vetores unitários 3D"""
+    lat = np.radians(np.asarray(latitude, dtype="float64"))
+    lon = np.radians(np.asarray(longitude, dtype="float64"))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+def _chord_to_km(corda):
+    """Distância de corda na esfera unitária -> distância de grande círculo (km)"""
+    return 2.0 * np.arcsin(np.clip(corda / 2.0, 0.0, 1.0)) * EARTH_RADIUS_KM
+
+def _km_to_chord(km):
+    return 2.0 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+class MunicipalityIndex:
+    """
+    Índice espacial sobre os centroides dos municípios.
+
+    Os centroides são guardados como vetores unitários em uma KD-tree; a
+    distância de corda é monotônica com a distância de grande círculo, então
+    consultas por raio e k vizinhos equivalem às feitas com haversine e as
+    distâncias retornadas são convertidas de volta para km.
+    """
+
+    def __init__(self, municipios):
+        """
+        Args:
+            municipios (pd.DataFrame): colunas 'codigo_ibge', 'nome', 'estado', 'latitude' e 'longitude'
+        """
+        ref = municipios.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+        self.municipios = ref
+        self.codigos = ref["codigo_ibge"].to_numpy(dtype="int64")
+        self._posicao = pd.Series(np.arange(len(ref)), index=self.codigos)
+        self._latlon = ref[["latitude", "longitude"]].to_numpy(dtype="float64")
+        self._xyz = _unit_vectors(self._latlon[:, 0], self._latlon[:, 1])
+        self._tree = cKDTree(self._xyz)
+        self._knn = {}
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def query_radius(self, latitude, longitude, raio_km):
+        """
+        Municípios cujo centroide está a até raio_km do ponto informado.
+
+        Returns:
+            tuple: (codigos_ibge, distancias_km) ordenados por distância
+        """
+        ponto = _unit_vectors(latitude, longitude)
+        indices = np.asarray(self._tree.query_ball_point(ponto, _km_to_chord(raio_km)), dtype="int64")
+        distancias = _chord_to_km(np.linalg.norm(self._xyz[indices] - ponto, axis=1))
+        ordem = np.argsort(distancias)
+        return self.codigos[indices[ordem]], distancias[ordem]
+
+    def query_knn(self, latitude, longitude, k=DEFAULT_K):
+        """
+        Os k municípios mais próximos do ponto informado.
+
+        Returns:
+            tuple: (codigos_ibge, distancias_km) ordenados por distância
+        """
+        cordas, indices = self._tree.query(_unit_vectors(latitude, longitude), k=min(k, len(self)))
+        return self.codigos[np.atleast_1d(indices)], _chord_to_km(np.atleast_1d(cordas))
+
+    def coordenadas(self, codigo_ibge):
+        """Retorna (latitude, longitude) do centroide de um município"""
+        lat, lon = self._latlon[self._posicao[codigo_ibge]]
+        return float(lat), float(lon)
+
+    def vizinhos(self, codigo_ibge, raio_km=None, k=DEFAULT_K):
+        """
+        Vizinhos de um município (excluindo ele próprio), por raio se
+        raio_km for informado, senão pelos k mais próximos.
+        Retorna um DataFrame com codigo_ibge, nome, estado e distancia_km.
+        """
+        lat, lon = self.coordenadas(codigo_ibge)
+        if raio_km is not None:
+            codigos, distancias = self.query_radius(lat, lon, raio_km)
+        else:
+            codigos, distancias = self.query_knn(lat, lon, k + 1)
+        manter = codigos != codigo_ibge
+        result = self.municipios.iloc[self._posicao[codigos[manter]].to_numpy()]
+        result = result[["codigo_ibge", "nome", "estado", "latitude", "longitude"]].reset_index(drop=True)
+        result["distancia_km"] = distancias[manter]
+        return result
+
+    def knn_arrays(self, k=DEFAULT_K):
+        """
+        k vizinhos mais próximos de todos os municípios em uma única consulta.
+
+        Returns:
+            tuple: (indices, distancias_km), ambos com forma (n_municipios, k);
+            'indices' são posições em self.codigos, sem o próprio município.
+        """
+        k = min(k, len(self) - 1)
+        if k not in self._knn:
+            cordas, indices = self._tree.query(self._xyz, k=k + 1)
+            # A primeira coluna é o próprio município (distância zero)
+            self._knn[k] = (indices[:, 1:], _chord_to_km(cordas[:, 1:]))
+        return self._knn[k]
+
+    def knn_table(self, k=DEFAULT_K):
+        """
+        Tabela de vizinhança no formato de municipios_vizinhos.
+        """
+        indices, distancias = self.knn_arrays(k)
+        n, k = indices.shape
+        return pd.DataFrame({
+            "codigo_ibge": np.repeat(self.codigos, k),
+            "vizinho_ibge": self.codigos[indices.ravel()],
+            "ordem": np.tile(np.arange(1, k + 1), n),
+            "distancia_km": distancias.ravel(),
+        })
+
+def neighbor_weights(distancias_km, esquema="uniforme"):
+    """
+    Pesos espaciais para uma matriz (n, k) de distâncias até os vizinhos.
+
+    'uniforme' dá peso 1 a cada vizinho (soma simples de casos);
+    'inverso_distancia' usa 1/d normalizado para somar 1 por linha (média
+    ponderada).
+    """
+    if esquema == "uniforme":
+        return np.ones_like(distancias_km, dtype="float64")
+    if esquema == "inverso_distancia":
+        pesos = 1.0 / np.maximum(distancias_km, 1.0)
+        return pesos / pesos.sum(axis=1, keepdims=True)
+    raise ValueError(f"Esquema de pesos desconhecido: {esquema}")
+
+def neighbor_case_sums(index, casos, k=DEFAULT_K, esquema="uniforme"):
+    """
+    Soma ponderada dos casos dos vizinhos para todos os municípios de uma vez.
+
+    Args:
+        index (MunicipalityIndex): índice espacial
+        casos (pd.Series | pd.DataFrame): casos indexados por codigo_ibge; um
+            DataFrame (ex.: uma coluna por semana) é processado em bloco
+        k (int): número de vizinhos
+        esquema (str): esquema de pesos (ver neighbor_weights)
+
+    Returns:
+        pd.Series | pd.DataFrame: mesmo formato de 'casos', indexado por codigo_ibge
+    """
+    indices, distancias = index.knn_arrays(k)
+    pesos = neighbor_weights(distancias, esquema)
+    alinhado = casos.reindex(index.codigos).fillna(0)
+    valores = alinhado.to_numpy(dtype="float64")
+    # valores[indices] tem forma (n, k) ou (n, k, colunas)
+    somas = np.einsum("nk,nk...->n...", pesos, valores[indices])
+    if isinstance(casos, pd.DataFrame):
+        return pd.DataFrame(somas, index=alinhado.index, columns=casos.columns)
+    return pd.Series(somas, index=alinhado.index, name=casos.name)
+
+def build_municipality_index(conn):
+    """
+    Monta o índice espacial a partir da tabela municipios.
+    Retorna None se não houver municípios com coordenadas.
+    """
+    municipios = load_municipios(conn)
+    if municipios.dropna(subset=["latitude", "longitude"]).empty:
+        logger.warning("Nenhum município com coordenadas para montar o índice espacial")
+        return None
+    index = MunicipalityIndex(municipios)
+    logger.info(f"Índice espacial montado com {len(index)} municípios")
+    return index
+
+def refresh_neighbor_table(conn, k=DEFAULT_K):
+    """
+    Recalcula a tabela municipios_vizinhos a partir dos centroides atuais.
+
+    Returns:
+        int: número de pares gravados
+    """
+    index = build_municipality_index(conn)
+    if index is None:
+        return 0
+    create_vizinhos_table(conn)
+    total = save_vizinhos(conn, index.knn_table(k))
+    logger.info(f"Tabela municipios_vizinhos atualizada: {total} pares (k={k})")
+    return total
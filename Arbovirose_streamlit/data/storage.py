@@ -0,0 +1,529 @@
+# Arbovirose_streamlit/data/storage.py
+import io
+import sqlite3
+import logging
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
+
+from config.settings import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Linhas por lote em executemany / COPY
+BULK_BATCH_SIZE = 50_000
+
+# Erros de banco tratados pelos jobs, qualquer que seja o backend
+DATABASE_ERRORS = (sqlite3.Error, pd.errors.DatabaseError, SQLAlchemyError)
+try:
+    import psycopg2
+    DATABASE_ERRORS += (psycopg2.Error,)
+except ImportError:
+    pass
+try:
+    import psycopg
+    DATABASE_ERRORS += (psycopg.Error,)
+except ImportError:
+    pass
+
+def connect_sqlite(database_url=DATABASE_URL):
+    """
+    Abre uma conexão sqlite3 para uma URL SQLAlchemy 'sqlite:///...'.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        raise ValueError(f"URL não aponta para SQLite: {url.get_backend_name()}")
+    return sqlite3.connect(url.database or ":memory:")
+
+def connect(database_url=DATABASE_URL):
+    """
+    Abre uma conexão DB-API com o banco de config.settings.DATABASE_URL:
+    sqlite3 para SQLite e a conexão do driver (psycopg2 ou psycopg 3) para
+    Postgres. Jobs, coletor, API e páginas usam esta mesma entrada.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return connect_sqlite(database_url)
+    if backend == "postgresql":
+        # Sem pool: close() encerra a conexão de fato
+        return create_engine(url, poolclass=NullPool).raw_connection()
+    raise ValueError(f"Backend de banco não suportado: {backend}")
+
+def _is_sqlite(conn):
+    return isinstance(conn, sqlite3.Connection)
+
+def _execute(conn, sql, params=(), many=False):
+    """
+    Executa um comando escrito com marcadores '?' (estilo sqlite3),
+    traduzidos para '%s' em outros drivers. Retorna o cursor.
+    """
+    if not _is_sqlite(conn):
+        sql = sql.replace("?", "%s")
+    cursor = conn.cursor()
+    if many:
+        cursor.executemany(sql, params)
+    else:
+        cursor.execute(sql, params)
+    return cursor
+
+def _read_query(conn, sql):
+    """
+    Consulta para DataFrame direto pelo cursor DB-API (pandas só aceita
+    sqlite3 ou SQLAlchemy). Em erro a transação é desfeita, já que no
+    Postgres um comando que falha invalida a transação aberta.
+    """
+    try:
+        cursor = _execute(conn, sql)
+        return pd.DataFrame(cursor.fetchall(), columns=[c[0] for c in cursor.description])
+    except DATABASE_ERRORS:
+        conn.rollback()
+        raise
+
+def _id_column(conn):
+    """Chave primária autoincrementada no dialeto da conexão"""
+    return "INTEGER PRIMARY KEY AUTOINCREMENT" if _is_sqlite(conn) else "SERIAL PRIMARY KEY"
+
+def create_epi_data_table(conn):
+    """
+    Cria a tabela epi_data se não existir.
+    """
+    _execute(conn, f"""
+        CREATE TABLE IF NOT EXISTS epi_data (
+            id {_id_column(conn)},
+            estado TEXT,
+            municipio TEXT,
+            data TEXT,
+            casos_confirmados INTEGER
+        )
+    """)
+    conn.commit()
+
+def create_schema(conn):
+    """
+    Cria todas as tabelas (e índices) usadas pelos jobs, se não existirem.
+    """
+    create_epi_data_table(conn)
+    create_epi_data_indexes(conn)
+    create_municipios_table(conn)
+    create_vizinhos_table(conn)
+    create_quarantine_table(conn)
+
+def create_epi_data_indexes(conn):
+    """
+    Cria os índices de consulta da tabela epi_data se não existirem.
+    """
+    _execute(conn, """
+        CREATE INDEX IF NOT EXISTS idx_epi_data_municipio_data
+        ON epi_data (estado, municipio, data)
+    """)
+    conn.commit()
+
+def create_municipios_table(conn):
+    """
+    Cria a tabela de referência de municípios (IBGE) se não existir.
+    """
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS municipios (
+            codigo_ibge INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            populacao INTEGER
+        )
+    """)
+    conn.commit()
+
+def create_quarantine_table(conn):
+    """
+    Cria a tabela epi_data_quarantine, que guarda as linhas rejeitadas
+    na validação de ingestão junto com o motivo da rejeição.
+    """
+    _execute(conn, f"""
+        CREATE TABLE IF NOT EXISTS epi_data_quarantine (
+            id {_id_column(conn)},
+            estado TEXT,
+            municipio TEXT,
+            data TEXT,
+            casos_confirmados TEXT,
+            motivo TEXT NOT NULL,
+            fonte TEXT,
+            quarentenado_em TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+def create_vizinhos_table(conn):
+    """
+    Cria a tabela municipios_vizinhos (k vizinhos mais próximos de cada
+    município, por distância haversine entre centroides) se não existir.
+    """
+    _execute(conn, """
+        CREATE TABLE IF NOT EXISTS municipios_vizinhos (
+            codigo_ibge INTEGER NOT NULL,
+            vizinho_ibge INTEGER NOT NULL,
+            ordem INTEGER NOT NULL,
+            distancia_km REAL NOT NULL,
+            PRIMARY KEY (codigo_ibge, vizinho_ibge)
+        )
+    """)
+    conn.commit()
+
+def load_municipios(conn):
+    """
+    Carrega a tabela de municípios.
+    Retorna um pandas DataFrame (vazio se a tabela ainda não foi populada).
+    """
+    try:
+        return _read_query(conn, "SELECT codigo_ibge, nome, estado, latitude, longitude, populacao FROM municipios")
+    except DATABASE_ERRORS as e:
+        logger.warning(f"Tabela municipios indisponível: {str(e)}")
+        return pd.DataFrame(columns=["codigo_ibge", "nome", "estado", "latitude", "longitude", "populacao"])
+
+def save_municipios(conn, municipios):
+    """
+    Substitui o conteúdo da tabela municipios.
+
+    Returns:
+        int: número de municípios gravados
+    """
+    columns = ["codigo_ibge", "nome", "estado", "latitude", "longitude", "populacao"]
+    return load_table(conn, municipios.reindex(columns=columns), "municipios", replace=True)
+
+def save_populacao(conn, populacao):
+    """
+    Atualiza a coluna populacao da tabela municipios.
+
+    Args:
+        conn: conexão aberta (connect)
+        populacao (pd.DataFrame): colunas 'codigo_ibge' e 'populacao'
+
+    Returns:
+        int: número de municípios atualizados
+    """
+    rows = populacao.dropna(subset=["codigo_ibge", "populacao"])
+    cursor = _execute(
+        conn,
+        "UPDATE municipios SET populacao = ? WHERE codigo_ibge = ?",
+        list(zip(rows["populacao"].astype("int64").tolist(), rows["codigo_ibge"].astype("int64").tolist())),
+        many=True
+    )
+    conn.commit()
+    return cursor.rowcount
+
+def load_vizinhos(conn):
+    """
+    Carrega a tabela de vizinhança ordenada por município e proximidade.
+    Retorna um pandas DataFrame (vazio se a tabela não existir).
+    """
+    try:
+        return _read_query(
+            conn,
+            "SELECT codigo_ibge, vizinho_ibge, ordem, distancia_km FROM municipios_vizinhos "
+            "ORDER BY codigo_ibge, ordem"
+        )
+    except DATABASE_ERRORS as e:
+        logger.warning(f"Tabela municipios_vizinhos indisponível: {str(e)}")
+        return pd.DataFrame(columns=["codigo_ibge", "vizinho_ibge", "ordem", "distancia_km"])
+
+def save_vizinhos(conn, vizinhos):
+    """
+    Substitui o conteúdo da tabela municipios_vizinhos.
+
+    Returns:
+        int: número de pares gravados
+    """
+    columns = ["codigo_ibge", "vizinho_ibge", "ordem", "distancia_km"]
+    return load_table(conn, vizinhos.reindex(columns=columns), "municipios_vizinhos", replace=True)
+
+def save_quarantine(conn, rejected, fonte=None):
+    """
+    Grava as linhas rejeitadas pela validação em epi_data_quarantine.
+
+    Args:
+        conn: conexão aberta (connect)
+        rejected (pd.DataFrame): linhas rejeitadas com a coluna 'motivo'
+        fonte (str): origem dos dados (ex.: 'mosqlimate', 'infodengue')
+
+    Returns:
+        int: número de linhas gravadas
+    """
+    if rejected is None or rejected.empty:
+        return 0
+    rows = rejected.reindex(columns=["estado", "municipio", "data", "casos_confirmados", "motivo"])
+    # Valores originais são preservados como texto para auditoria
+    rows = rows.astype("string").astype(object).where(rows.notna(), None)
+    rows["fonte"] = fonte
+    rows["quarentenado_em"] = datetime.now().isoformat(timespec="seconds")
+    _execute(conn, """
+        INSERT INTO epi_data_quarantine
+            (estado, municipio, data, casos_confirmados, motivo, fonte, quarentenado_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, list(rows.itertuples(index=False, name=None)), many=True)
+    conn.commit()
+    logger.info(f"{len(rows)} registros enviados para epi_data_quarantine")
+    return len(rows)
+
+def _iter_batches(data, batch_size):
+    """Divide o DataFrame em fatias consecutivas de até batch_size linhas"""
+    for start in range(0, len(data), batch_size):
+        yield data.iloc[start:start + batch_size]
+
+def _native_values(serie):
+    """
+    Valores da coluna como tipos nativos do Python, aceitos pelo sqlite3.
+    Ausentes (NaN, pd.NA de dtypes anuláveis, NaT) viram None.
+    """
+    if not serie.hasnans:
+        return serie.tolist()
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+def _drop_indexes(conn, table):
+    """
+    Remove os índices de uma tabela SQLite e retorna o SQL que os recria.
+    """
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+def bulk_load_sqlite(conn, data, table, batch_size=BULK_BATCH_SIZE, manage_indexes=True):
+    """
+    Carga em massa em uma tabela SQLite usando uma única transação.
+
+    Os índices da tabela são removidos antes da carga e recriados ao final
+    (dentro da mesma transação), e as linhas são enviadas em lotes com
+    executemany. Se a conexão já tiver uma transação aberta (ex.: um DELETE
+    feito pelo chamador), a carga participa dela.
+
+    Args:
+        conn: conexão sqlite3 aberta
+        data (pd.DataFrame): linhas a inserir; as colunas devem existir na tabela
+        table (str): nome da tabela de destino
+        batch_size (int): linhas por chamada de executemany
+        manage_indexes (bool): False deixa os índices como estão, para quem
+            carrega vários lotes e reconstrói os índices uma vez só (merge_epi_data)
+
+    Returns:
+        int: número de linhas inseridas
+    """
+    columns = list(data.columns)
+    insert_sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    try:
+        indexes = _drop_indexes(conn, table) if manage_indexes else []
+        for batch in _iter_batches(data, batch_size):
+            conn.executemany(insert_sql, zip(*(_native_values(batch[col]) for col in columns)))
+        for sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return len(data)
+
+def bulk_load_postgres(raw_conn, data, table, batch_size=BULK_BATCH_SIZE):
+    """
+    Carga em massa no Postgres com COPY FROM STDIN, enviando o DataFrame
+    como CSV em lotes. Aceita conexões psycopg2 e psycopg 3.
+
+    Returns:
+        int: número de linhas inseridas
+    """
+    columns = list(data.columns)
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    chunks = (batch.to_csv(index=False, header=False) for batch in _iter_batches(data, batch_size))
+    cursor = raw_conn.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            for chunk in chunks:
+                cursor.copy_expert(copy_sql, io.StringIO(chunk))
+        else:
+            with cursor.copy(copy_sql) as copy:
+                for chunk in chunks:
+                    copy.write(chunk)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(data)
+
+def load_table(conn, data, table, batch_size=BULK_BATCH_SIZE, replace=False, where=None, manage_indexes=True):
+    """
+    Carga em massa numa conexão já aberta, pelo caminho do driver:
+    bulk_load_sqlite para sqlite3 e COPY (bulk_load_postgres) para Postgres.
+
+    Args:
+        conn: conexão aberta (connect)
+        data (pd.DataFrame): linhas a inserir
+        table (str): nome da tabela de destino
+        batch_size (int): linhas por lote
+        replace (bool): apaga linhas da tabela na mesma transação antes da carga
+        where (tuple): (condição com marcadores '?', parâmetros) que restringe
+            o que replace apaga; sem ela a tabela inteira é substituída
+        manage_indexes (bool): no SQLite, remove e recria os índices em volta
+            da carga (ver bulk_load_sqlite)
+
+    Returns:
+        int: número de linhas inseridas
+    """
+    if replace:
+        condicao, params = where if where else ("", ())
+        if _is_sqlite(conn) and not conn.in_transaction:
+            conn.execute("BEGIN")
+        # DELETE abre a transação da qual a carga em massa participa
+        _execute(conn, f"DELETE FROM {table}" + (f" WHERE {condicao}" if condicao else ""), params).close()
+    if _is_sqlite(conn):
+        return bulk_load_sqlite(conn, data, table, batch_size, manage_indexes=manage_indexes)
+    return bulk_load_postgres(conn, data, table, batch_size)
+
+def bulk_load(data, table, database_url=DATABASE_URL, batch_size=BULK_BATCH_SIZE, replace=False, where=None):
+    """
+    Carga em massa detectando o backend pela URL do banco.
+
+    SQLite usa transação única com executemany e reconstrução de índices;
+    Postgres usa COPY FROM STDIN. É o caminho de escrita de epi_data nos
+    jobs e no backfill histórico (jobs/backfill.py).
+
+    Args:
+        data (pd.DataFrame): linhas a inserir
+        table (str): nome da tabela de destino
+        database_url (str): URL SQLAlchemy do banco (padrão: config.settings.DATABASE_URL)
+        batch_size (int): linhas por lote
+        replace (bool): apaga o conteúdo da tabela na mesma transação antes da carga
+        where (tuple): restringe o que replace apaga, como em load_table
+
+    Returns:
+        int: número de linhas inseridas
+    """
+    backend = make_url(database_url).get_backend_name()
+    inicio = datetime.now()
+    conn = connect(database_url)
+    try:
+        total = load_table(conn, data, table, batch_size, replace=replace, where=where)
+    finally:
+        conn.close()
+
+    segundos = (datetime.now() - inicio).total_seconds()
+    logger.info(f"Carga em massa ({backend}): {total} linhas em {table} em {segundos:.1f} s")
+    return total
+
+def save_epi_data(data, database_url=DATABASE_URL):
+    """
+    Grava um lote validado de epi_data por carga em massa, substituindo as
+    linhas das mesmas UFs no mesmo período (as demais, como o histórico de
+    um backfill ou UFs de outra fonte, são mantidas).
+
+    Returns:
+        int: número de linhas inseridas
+    """
+    estados = sorted(data["estado"].unique())
+    condicao = f"estado IN ({', '.join('?' for _ in estados)}) AND data >= ? AND data <= ?"
+    params = (*estados, data["data"].min(), data["data"].max())
+    return bulk_load(data, "epi_data", database_url, replace=True, where=(condicao, params))
+
+def merge_epi_data(conn, lotes, replace=False, batch_size=BULK_BATCH_SIZE):
+    """
+    Carga em massa de vários lotes de epi_data numa mesma sessão,
+    substituindo as linhas já gravadas das UFs e períodos recebidos, como
+    save_epi_data faz para um lote só.
+
+    Os lotes vão para uma tabela temporária sem índices, a um custo que não
+    cresce com epi_data, enquanto o período de cada UF é acumulado. No fim,
+    numa única transação, esses períodos são apagados de epi_data, as
+    linhas entram com INSERT ... SELECT e, no SQLite, os índices de
+    epi_data são removidos e recriados uma vez só. Os lotes não devem
+    repetir (estado, municipio, data) entre si. É o caminho do backfill
+    histórico (jobs/backfill.py).
+
+    Args:
+        conn: conexão aberta (connect)
+        lotes (iterable): DataFrames validados com as colunas de epi_data
+        replace (bool): apaga epi_data inteira em vez de só os períodos recebidos
+        batch_size (int): linhas por lote de carga na tabela temporária
+
+    Returns:
+        int: número de linhas inseridas em epi_data
+    """
+    columns = ["estado", "municipio", "data", "casos_confirmados"]
+    colunas = ", ".join(columns)
+    _execute(conn, "DROP TABLE IF EXISTS epi_data_lote").close()
+    _execute(conn, """
+        CREATE TEMPORARY TABLE epi_data_lote (
+            estado TEXT,
+            municipio TEXT,
+            data TEXT,
+            casos_confirmados INTEGER
+        )
+    """).close()
+    conn.commit()
+
+    inicio = datetime.now()
+    recebidas = 0
+    periodos = None
+    for lote in lotes:
+        recebidas += load_table(conn, lote.reindex(columns=columns), "epi_data_lote", batch_size, manage_indexes=False)
+        periodo = lote.groupby("estado")["data"].agg(["min", "max"])
+        if periodos is not None:
+            periodo = pd.concat([periodos, periodo]).groupby(level=0).agg({"min": "min", "max": "max"})
+        periodos = periodo
+        segundos = (datetime.now() - inicio).total_seconds()
+        logger.info(f"{recebidas} linhas recebidas ({recebidas / max(segundos, 1e-9):,.0f} linhas/s)")
+    if not recebidas:
+        # Nada a trocar: epi_data fica intacta, mesmo com replace
+        _execute(conn, "DROP TABLE epi_data_lote").close()
+        conn.commit()
+        return 0
+
+    try:
+        if _is_sqlite(conn) and not conn.in_transaction:
+            conn.execute("BEGIN")
+        if replace:
+            _execute(conn, "DELETE FROM epi_data").close()
+        else:
+            # Um DELETE por UF, com o período somado de todos os lotes
+            _execute(
+                conn, "DELETE FROM epi_data WHERE estado = ? AND data >= ? AND data <= ?",
+                list(periodos.itertuples(name=None)), many=True
+            ).close()
+        indexes = _drop_indexes(conn, "epi_data") if _is_sqlite(conn) else []
+        cursor = _execute(conn, f"INSERT INTO epi_data ({colunas}) SELECT {colunas} FROM epi_data_lote")
+        total = cursor.rowcount
+        cursor.close()
+        for sql in indexes:
+            conn.execute(sql)
+        _execute(conn, "DROP TABLE epi_data_lote").close()
+        conn.commit()
+    except DATABASE_ERRORS:
+        conn.rollback()
+        raise
+
+    segundos = (datetime.now() - inicio).total_seconds()
+    logger.info(f"Carga em massa: {total} linhas em epi_data em {segundos:.1f} s")
+    return total
+
+def load_epi_data(conn):
+    """
+    Carrega a tabela epi_data inteira (sem a coluna id).
+    Retorna um pandas DataFrame (vazio se a tabela não existir).
+    """
+    try:
+        return _read_query(conn, "SELECT estado, municipio, data, casos_confirmados FROM epi_data")
+    except DATABASE_ERRORS as e:
+        logger.warning(f"Tabela epi_data indisponível: {str(e)}")
+        return pd.DataFrame(columns=["estado", "municipio", "data", "casos_confirmados"])
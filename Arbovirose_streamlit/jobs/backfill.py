@@ -0,0 +1,144 @@
+"""
+Backfill histórico de epi_data por carga em massa.
+
+Os lotes passam pela mesma validação dos jobs e vão para o banco de
+DATABASE_URL por merge_epi_data: carga em massa numa tabela temporária
+(COPY no Postgres, executemany no SQLite) e, ao final, uma única troca em
+epi_data em que as UFs e períodos recebidos substituem o que já estava
+gravado, com os índices reconstruídos uma vez. Ao final o snapshot, o
+feature store e os indicadores são recalculados a partir da tabela inteira.
+
+Uso:
+    cd Arbovirose_streamlit
+    python -m jobs.backfill historico.csv
+    python -m jobs.backfill --inicio 2015-01-01 --fim 2023-12-31
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data.processor import attach_codigo_ibge, refresh_feature_store, refresh_indicator_store
+from data.snapshot import publish_snapshot
+from data.storage import DATABASE_ERRORS, load_epi_data, load_municipios, merge_epi_data, save_quarantine
+from jobs.daily_update import create_database, fetch_mosqlimate_data
+from utils.validators import EPI_COLUMNS, validate_epi_data
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Linhas lidas do arquivo por lote (validação e carga)
+LINHAS_POR_LOTE = 1_000_000
+
+def read_file(caminho, linhas_por_lote=LINHAS_POR_LOTE):
+    """
+    Lê um CSV com as colunas de epi_data em lotes, sem carregar o arquivo inteiro.
+    """
+    yield from pd.read_csv(caminho, usecols=EPI_COLUMNS, chunksize=linhas_por_lote)
+
+def fetch_mosqlimate_years(inicio, fim, disease="dengue"):
+    """
+    Busca o período no Mosqlimate um ano por vez.
+    """
+    for ano_inicio in pd.date_range(inicio, fim, freq="YS").union([pd.Timestamp(inicio)]):
+        ano_fim = min(ano_inicio + pd.offsets.YearEnd(0), pd.Timestamp(fim))
+        data = fetch_mosqlimate_data(disease, ano_inicio.strftime("%Y-%m-%d"), ano_fim.strftime("%Y-%m-%d"))
+        if data is not None:
+            yield data
+
+def week_keys(data, municipios):
+    """
+    Chave inteira (código IBGE, semana epidemiológica) de cada linha validada,
+    a mesma usada pela checagem de duplicidade de validate_epi_data.
+    """
+    # Poucos pares (estado, municipio) distintos: só eles são casados com municipios
+    uf_codes, ufs = pd.factorize(data["estado"])
+    mun_codes, nomes = pd.factorize(data["municipio"])
+    par_codes, pares = pd.factorize(uf_codes.astype("int64") * len(nomes) + mun_codes)
+    par_uf, par_mun = np.divmod(pares, len(nomes))
+    unicos = pd.DataFrame({"estado": ufs[par_uf], "municipio": nomes[par_mun]})
+    codigos = attach_codigo_ibge(unicos, municipios)["codigo_ibge"].to_numpy(dtype="int64")[par_codes]
+    dias = pd.to_datetime(data["data"], format="%Y-%m-%d").to_numpy(dtype="datetime64[D]").astype("int64")
+    # A semana epidemiológica começa no domingo (1970-01-04 é o domingo de referência)
+    return codigos * 100_000 + np.floor_divide(dias - 3, 7)
+
+def backfill(lotes, substituir=False, fonte="backfill"):
+    """
+    Valida e carrega os lotes em epi_data e recalcula os artefatos derivados.
+
+    Args:
+        lotes (iterable): DataFrames com as colunas de epi_data
+        substituir (bool): apaga epi_data inteira antes da carga, em vez de
+            substituir só as UFs e períodos recebidos
+        fonte (str): origem registrada na quarentena
+
+    Returns:
+        int: número de linhas gravadas
+    """
+    conn = create_database()
+    if not conn:
+        logger.error("Falha ao criar ou conectar ao banco de dados")
+        return 0
+
+    try:
+        municipios = load_municipios(conn)
+        if municipios.empty:
+            logger.warning("Tabela municipios vazia; execute collector.populate_municipios antes do backfill")
+            return 0
+
+        def validados():
+            vistas = np.empty(0, dtype="int64")
+            for lote in lotes:
+                validos, rejeitados = validate_epi_data(lote, municipios)
+                # A validação só compara linhas do mesmo lote; entre lotes vale a
+                # mesma regra (a primeira ocorrência de município e semana fica)
+                chaves = week_keys(validos, municipios)
+                repetidas = np.isin(chaves, vistas)
+                if repetidas.any():
+                    rejeitados = pd.concat([rejeitados, validos[repetidas].assign(motivo="duplicado")])
+                    validos = validos[~repetidas]
+                vistas = np.union1d(vistas, chaves)
+                save_quarantine(conn, rejeitados, fonte=fonte)
+                if not validos.empty:
+                    yield validos
+
+        # As UFs e períodos recebidos substituem o que já estava gravado
+        # (ex.: o período carregado pelo job diário), como em save_epi_data
+        total = merge_epi_data(conn, validados(), replace=substituir)
+        if not total:
+            logger.warning("Nenhum registro válido no backfill")
+            return 0
+
+        data = load_epi_data(conn)
+        publish_snapshot(data)
+        # O histórico novo precede as semanas já guardadas: recria do zero
+        refresh_feature_store(conn, data, recriar=True, historico=data)
+        refresh_indicator_store(conn, data, recriar=True, historico=data)
+        return total
+    except (*DATABASE_ERRORS, OSError, ValueError) as e:
+        logger.error(f"Erro no backfill: {str(e)}")
+        return 0
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill histórico de epi_data")
+    parser.add_argument("arquivo", nargs="?", help="CSV com estado, municipio, data e casos_confirmados")
+    parser.add_argument("--inicio", help="início do período no Mosqlimate (sem arquivo)")
+    parser.add_argument("--fim", default=pd.Timestamp.now().strftime("%Y-%m-%d"), help="fim do período no Mosqlimate")
+    parser.add_argument("--doenca", default="dengue")
+    parser.add_argument("--linhas-por-lote", type=int, default=LINHAS_POR_LOTE)
+    parser.add_argument("--substituir", action="store_true", help="apaga epi_data antes da carga")
+    args = parser.parse_args(argv)
+
+    if args.arquivo:
+        lotes, fonte = read_file(args.arquivo, args.linhas_por_lote), "backfill"
+    elif args.inicio:
+        lotes, fonte = fetch_mosqlimate_years(args.inicio, args.fim, args.doenca), "mosqlimate"
+    else:
+        parser.error("informe um arquivo ou --inicio")
+    backfill(lotes, substituir=args.substituir, fonte=fonte)
+
+if __name__ == "__main__":
+    main()
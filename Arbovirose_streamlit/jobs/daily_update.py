@@ -1,4 +1,3 @@
-import sqlite3
 import pandas as pd
 import requests
 import logging
@@ -6,6 +5,15 @@ from datetime import datetime, timedelta
 import schedule
 import time
 import os
+from data.storage import (
+    DATABASE_ERRORS, connect, create_schema, load_epi_data, load_municipios,
+    save_epi_data, save_quarantine
+)
+from config.settings import KEEP_ALIVE_URL, MOSQLIMATE_API_URL
+from data.collector import populate_municipios
+from data.processor import refresh_feature_store, refresh_indicator_store
+from data.snapshot import publish_snapshot
+from utils.validators import validate_epi_data
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,24 +21,14 @@ logger = logging.getLogger(__name__)
 
 def create_database():
     """
-    Cria o banco arbovirose.db e a tabela epi_data se não existirem.
+    Conecta ao banco de DATABASE_URL e cria as tabelas se não existirem.
     """
     try:
-        conn = sqlite3.connect("arbovirose.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS epi_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                estado TEXT,
-                municipio TEXT,
-                data TEXT,
-                casos_confirmados INTEGER
-            )
-        """)
-        conn.commit()
+        conn = connect()
+        create_schema(conn)
         logger.info("Banco de dados e tabela epi_data criados ou verificados")
         return conn
-    except sqlite3.Error as e:
+    except DATABASE_ERRORS as e:
         logger.error(f"Erro ao criar banco de dados: {str(e)}")
         return None
 
@@ -45,7 +43,7 @@ def fetch_mosqlimate_data(disease="dengue", start_date=None, end_date=None):
         end_date = datetime.now().strftime("%Y-%m-%d")
     
     try:
-        url = f"https://api.mosqlimate.org/data/{disease}?start_date={start_date}&end_date={end_date}"
+        url = f"{MOSQLIMATE_API_URL}/data/{disease}?start_date={start_date}&end_date={end_date}"
         logger.info(f"Buscando dados do Mosqlimate: {url}")
         response = requests.get(url, timeout=10)
         response.raise_for_status()
@@ -59,17 +57,16 @@ def fetch_mosqlimate_data(disease="dengue", start_date=None, end_date=None):
             "data": "data",
             "casos": "casos_confirmados"
         })
-        if "data" in data.columns:
-            data["data"] = pd.to_datetime(data["data"]).dt.strftime("%Y-%m-%d")
+        # Conversão de tipos e datas fica a cargo de validate_epi_data
         logger.info(f"Obtidos {len(data)} registros do Mosqlimate")
-        return data[["estado", "municipio", "data", "casos_confirmados"]]
+        return data.reindex(columns=["estado", "municipio", "data", "casos_confirmados"])
     except Exception as e:
         logger.error(f"Erro ao buscar dados do Mosqlimate: {str(e)}")
         return None
 
 def populate_database():
     """
-    Popula arbovirose.db com dados do Mosqlimate.
+    Popula o banco de DATABASE_URL com dados do Mosqlimate.
     """
     conn = create_database()
     if not conn:
@@ -82,24 +79,56 @@ def populate_database():
         conn.close()
         return
     
+    municipios = load_municipios(conn)
+    if municipios.empty:
+        # Validação referencial, feature store e indicadores dependem dos municípios
+        logger.info("Tabela municipios vazia; carregando a referência do IBGE")
+        populate_municipios()
+        municipios = load_municipios(conn)
+        if municipios.empty:
+            logger.error("Tabela municipios continua vazia; atualização interrompida")
+            conn.close()
+            return
+
     try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM epi_data")
-        
-        for _, row in data.iterrows():
-            cursor.execute("""
-                INSERT INTO epi_data (estado, municipio, data, casos_confirmados)
-                VALUES (?, ?, ?, ?)
-            """, (
-                row["estado"],
-                row["municipio"],
-                row["data"],
-                int(row.get("casos_confirmados", 0))
-            ))
-        conn.commit()
+        inicio = time.perf_counter()
+        data, rejeitados = validate_epi_data(data, municipios)
+        save_quarantine(conn, rejeitados, fonte="mosqlimate")
+        logger.info(
+            f"Validação concluída em {(time.perf_counter() - inicio) * 1000:.1f} ms: "
+            f"{len(data)} válidos, {len(rejeitados)} em quarentena"
+        )
+        if data.empty:
+            logger.warning("Nenhum registro válido para inserir no banco")
+            conn.close()
+            return
+
+        # Substitui o período baixado (DELETE e carga na mesma transação)
+        save_epi_data(data)
         logger.info(f"Inseridos {len(data)} registros na tabela epi_data")
-    except sqlite3.Error as e:
+    except DATABASE_ERRORS as e:
         logger.error(f"Erro ao inserir dados: {str(e)}")
+        conn.close()
+        return
+
+    try:
+        # Workers da API trocam para a nova versão sem reiniciar; o snapshot
+        # espelha a tabela inteira, incluindo o histórico fora do período baixado
+        publish_snapshot(load_epi_data(conn))
+    except OSError as e:
+        logger.error(f"Erro ao publicar snapshot: {str(e)}")
+
+    try:
+        # Só as semanas novas (e as últimas revisadas) são recalculadas
+        refresh_feature_store(conn, data)
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao atualizar feature store: {str(e)}")
+
+    try:
+        # Incidência, médias móveis e Rt lidos pelas páginas Dashboard e Alertas
+        refresh_indicator_store(conn, data)
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao atualizar indicadores: {str(e)}")
     finally:
         conn.close()
 
@@ -108,7 +137,7 @@ def keep_alive():
     Ping na API para evitar parada no Render (free-tier).
     """
     try:
-        response = requests.get("https://arbovirose-streamlit.onrender.com/ping")
+        response = requests.get(KEEP_ALIVE_URL, timeout=10)
         response.raise_for_status()
         logger.info("Ping keep-alive bem-sucedido")
     except Exception as e:
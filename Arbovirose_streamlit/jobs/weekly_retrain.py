@@ -0,0 +1,57 @@
+import logging
+import os
+import time
+
+import numpy as np
+import schedule
+
+from data.processor import FeatureStore
+from models.reconciliation import reconcile_forecasts, save_forecasts
+from models.trainer import save_model, train_model
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+HORIZONTES = (1, 2, 3, 4)
+
+def job():
+    """
+    Retreina os modelos de todos os horizontes a partir do feature store,
+    que já é mantido atualizado pelo daily_update, e publica as previsões
+    reconciliadas entre município, UF, região e Brasil.
+    """
+    store = FeatureStore()
+    if not len(store):
+        logger.warning("Feature store vazio; execute o daily_update antes do retreino")
+        return
+    logger.info(f"Iniciando retreino semanal com feature store {store.shape}")
+    modelos = {}
+    for horizonte in HORIZONTES:
+        try:
+            modelos[horizonte] = train_model(store, horizonte)
+            save_model(modelos[horizonte])
+        except ValueError as e:
+            logger.error(f"Falha ao treinar horizonte {horizonte}: {str(e)}")
+    try:
+        save_forecasts(reconcile_forecasts(store, modelos), store.ultima_semana)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        logger.error(f"Falha ao reconciliar previsões: {str(e)}")
+    logger.info("Retreino semanal concluído")
+
+def main():
+    """
+    Agenda o retreino semanal.
+    """
+    schedule.every().sunday.at("03:00").do(job)
+
+    logger.info("Iniciando agendador de retreino")
+    while True:
+        schedule.run_pending()
+        time.sleep(60)
+
+if __name__ == "__main__":
+    if os.getenv("MANUAL_RUN", "false").lower() == "true":
+        job()
+    else:
+        main()
@@ -0,0 +1,199 @@
+# Arbovirose_streamlit/loadtest/fake_upstream.py
+import io
+import json
+import time
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from utils.validators import epidemiological_week
+
+logger = logging.getLogger(__name__)
+
+UFS_SINTETICAS = ["MG", "SP", "RJ", "BA", "PR", "RS"]
+CODIGO_UF = {"MG": 31, "SP": 35, "RJ": 33, "BA": 29, "PR": 41, "RS": 43}
+
+class UpstreamConfig:
+    """
+    Parâmetros das réplicas locais: tamanho do conjunto sintético, latência
+    simulada e fração de respostas com erro (HTTP 503).
+    """
+
+    def __init__(self, municipios=200, semanas=52, latencia_ms=0.0, jitter_ms=0.0,
+                 taxa_erro=0.0, taxa_linhas_invalidas=0.01, seed=0):
+        self.municipios = municipios
+        self.semanas = semanas
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_linhas_invalidas = taxa_linhas_invalidas
+        self.seed = seed
+
+def synthetic_municipios(config):
+    """
+    Lista sintética de municípios no layout do CSV de municípios
+    (codigo_ibge, nome, latitude, longitude, codigo_uf).
+    """
+    rng = np.random.default_rng(config.seed)
+    ufs = np.array(UFS_SINTETICAS)[np.arange(config.municipios) % len(UFS_SINTETICAS)]
+    codigo_uf = np.array([CODIGO_UF[uf] for uf in ufs])
+    return pd.DataFrame({
+        "codigo_ibge": codigo_uf * 100000 + np.arange(config.municipios),
+        "nome": [f"Municipio {i:05d}" for i in range(config.municipios)],
+        "latitude": rng.uniform(-30, -5, config.municipios).round(5),
+        "longitude": rng.uniform(-55, -35, config.municipios).round(5),
+        "codigo_uf": codigo_uf,
+    })
+
+def synthetic_cases(config, municipios):
+    """
+    Série semanal sintética (sazonal + ruído de Poisson) para todos os
+    municípios, terminando na semana atual. Uma fração das linhas é
+    corrompida de propósito para exercitar a validação da ingestão.
+    """
+    rng = np.random.default_rng(config.seed + 1)
+    fim = pd.Timestamp.now().normalize()
+    semanas = pd.date_range(end=fim, periods=config.semanas, freq="7D")
+    n_mun, n_sem = len(municipios), len(semanas)
+    base = rng.gamma(2.0, 5.0, n_mun)[:, None]
+    sazonal = 1.0 + 0.8 * np.sin(2 * np.pi * semanas.dayofyear.to_numpy() / 365.25)[None, :]
+    casos = rng.poisson(base * sazonal)
+
+    data = pd.DataFrame({
+        "codigo_ibge": np.repeat(municipios["codigo_ibge"].to_numpy(), n_sem),
+        "municipio_nome": np.repeat(municipios["nome"].to_numpy(), n_sem),
+        "uf": np.repeat(municipios["codigo_uf"].map({v: k for k, v in CODIGO_UF.items()}).to_numpy(), n_sem),
+        "data": np.tile(semanas.strftime("%Y-%m-%d").to_numpy(), n_mun),
+        "casos": casos.ravel(),
+    })
+    invalidas = rng.random(len(data)) < config.taxa_linhas_invalidas
+    data["casos"] = data["casos"].astype(object)
+    data.loc[invalidas, "casos"] = -1
+    return data
+
+class FakeUpstream:
+    """
+    Servidor HTTP local que imita os serviços externos usados pelo projeto:
+
+    - /data/<doenca>          Mosqlimate ({"items": [...]})
+    - /api/alertcity          InfoDengue (lista de semanas de um geocode)
+    - /municipios.csv         lista de municípios com centroides
+    - /populacao              estimativas de população (formato da API SIDRA)
+    - /ping                   alvo do keep-alive
+    """
+
+    def __init__(self, config, host="127.0.0.1", port=0):
+        self.config = config
+        self.municipios = synthetic_municipios(config)
+        self.casos = synthetic_cases(config, self.municipios)
+        self._por_geocode = dict(tuple(self.casos.groupby("codigo_ibge")))
+        self._respostas = {}
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+        self.erros = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Réplica local dos serviços externos em {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _corpo(self, chave, gerar):
+        # Respostas são serializadas uma vez e reaproveitadas
+        if chave not in self._respostas:
+            self._respostas[chave] = gerar()
+        return self._respostas[chave]
+
+    def _mosqlimate(self):
+        itens = self.casos.drop(columns=["codigo_ibge"]).to_dict(orient="records")
+        return json.dumps({"items": itens}, default=int).encode()
+
+    def _alertcity(self, geocode):
+        df = self._por_geocode.get(geocode)
+        if df is None:
+            return b"[]"
+        datas = pd.to_datetime(df["data"])
+        ano, semana = epidemiological_week(datas)
+        registros = pd.DataFrame({
+            "data_iniSE": datas.astype("datetime64[ms]").astype("int64"),
+            "SE": ano * 100 + semana,
+            "casos": df["casos"],
+            "municipio_geocodigo": geocode,
+        })
+        return registros.to_json(orient="records").encode()
+
+    def _municipios_csv(self):
+        buffer = io.StringIO()
+        self.municipios.to_csv(buffer, index=False)
+        return buffer.getvalue().encode()
+
+    def _populacao(self):
+        rng = np.random.default_rng(self.config.seed + 2)
+        linhas = [{"D1C": "Município (Código)", "V": "Valor"}]
+        for codigo in self.municipios["codigo_ibge"]:
+            linhas.append({"D1C": str(codigo), "V": str(int(rng.lognormal(9.5, 1.2)))})
+        return json.dumps(linhas).encode()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _enviar(self, status, corpo, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                config = fake.config
+                with fake._lock:
+                    fake.requisicoes += 1
+                    atraso = config.latencia_ms + fake._rng.uniform(-config.jitter_ms, config.jitter_ms)
+                    falhar = fake._rng.random() < config.taxa_erro
+                    if falhar:
+                        fake.erros += 1
+                if atraso > 0:
+                    time.sleep(atraso / 1000)
+                if falhar:
+                    self._enviar(503, b'{"error": "indisponivel"}')
+                    return
+
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                if url.path.startswith("/data/"):
+                    self._enviar(200, fake._corpo("mosqlimate", fake._mosqlimate))
+                elif url.path == "/api/alertcity":
+                    geocode = int(params.get("geocode", ["0"])[0])
+                    self._enviar(200, fake._corpo(("alertcity", geocode), lambda: fake._alertcity(geocode)))
+                elif url.path == "/municipios.csv":
+                    self._enviar(200, fake._corpo("municipios", fake._municipios_csv), "text/csv")
+                elif url.path == "/populacao":
+                    self._enviar(200, fake._corpo("populacao", fake._populacao))
+                elif url.path == "/ping":
+                    self._enviar(200, b'{"status": "ok"}')
+                else:
+                    self._enviar(404, b'{"error": "not found"}')
+
+        return Handler
@@ -0,0 +1,321 @@
+# Arbovirose_streamlit/loadtest/harness.py
+"""
+Harness de carga e soak, totalmente local.
+
+Sobe réplicas falsas do Mosqlimate e do InfoDengue (loadtest.fake_upstream),
+aponta os jobs de ingestão e a API para elas via variáveis de ambiente,
+mede a vazão da ingestão, sobe a API com N workers e dispara clientes
+concorrentes que imitam sessões do dashboard. Ao final informa vazão,
+latências p50/p95/p99 e picos de memória (harness e processos da API).
+
+Uso:
+    cd Arbovirose_streamlit
+    python -m loadtest.harness --municipios 2000 --semanas 104 --clientes 32 --duracao 60
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+import requests
+
+from loadtest.fake_upstream import FakeUpstream, UpstreamConfig
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Harness de carga local (sem acesso à rede)")
+    parser.add_argument("--municipios", type=int, default=500, help="municípios sintéticos")
+    parser.add_argument("--semanas", type=int, default=52, help="semanas por município")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência das réplicas externas")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="variação da latência")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de respostas 503 das réplicas")
+    parser.add_argument("--taxa-linhas-invalidas", type=float, default=0.01, help="fração de linhas corrompidas")
+    parser.add_argument("--clientes", type=int, default=16, help="sessões simultâneas do dashboard")
+    parser.add_argument("--duracao", type=float, default=30.0, help="duração da fase de carga (s)")
+    parser.add_argument("--workers", type=int, default=2, help="workers da API")
+    parser.add_argument("--reingestao", type=float, default=0.0,
+                        help="intervalo (s) para reexecutar a ingestão durante a carga (soak); 0 desliga")
+    parser.add_argument("--infodengue", action="store_true", help="mede também a coleta do InfoDengue")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="grava o relatório neste arquivo")
+    return parser.parse_args(argv)
+
+def configure_environment(upstream_url, workdir):
+    """
+    Aponta serviços externos e artefatos para o ambiente local. Precisa
+    rodar antes de importar os módulos do projeto, que leem config.settings
+    na importação.
+    """
+    os.environ.update({
+        "MOSQLIMATE_API_URL": upstream_url,
+        "INFODENGUE_API_URL": upstream_url,
+        "MUNICIPIOS_URL": f"{upstream_url}/municipios.csv",
+        "POPULACAO_URL": f"{upstream_url}/populacao",
+        "KEEP_ALIVE_URL": f"{upstream_url}/ping",
+        "SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+        "FEATURE_STORE_DIR": os.path.join(workdir, "features"),
+        "MODELS_DIR": os.path.join(workdir, "modelos"),
+        "INDICATORS_DIR": os.path.join(workdir, "indicadores"),
+        # Jobs, API e páginas usam o mesmo banco, como em produção
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'arbovirose.db')}",
+    })
+    if PACKAGE_DIR not in sys.path:
+        sys.path.insert(0, PACKAGE_DIR)
+    # Nada deve ser gravado fora do diretório de trabalho
+    os.chdir(workdir)
+
+def percentiles(latencias):
+    if not latencias:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(np.max(latencias)), 2),
+    }
+
+def process_tree(pid):
+    """PIDs do processo e de todos os descendentes (via /proc)"""
+    filhos = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(entrada))
+    arvore, pendentes = [], [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        arvore.append(atual)
+        pendentes.extend(filhos.get(atual, []))
+    return arvore
+
+def peak_rss_mb(pid):
+    """Pico de memória residente (VmHWM) de um processo, em MB"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def harness_peak_rss_mb():
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def count_rows(estados=None):
+    from data.storage import connect, load_epi_data
+
+    conn = connect()
+    try:
+        data = load_epi_data(conn)
+    finally:
+        conn.close()
+    return int(data["estado"].isin(estados).sum()) if estados else len(data)
+
+def count_municipios():
+    from data.storage import connect, load_municipios
+
+    conn = connect()
+    try:
+        return len(load_municipios(conn))
+    finally:
+        conn.close()
+
+def measure_ingest(fake, incluir_infodengue):
+    """
+    Executa os jobs de ingestão contra as réplicas e mede a vazão.
+    'gravadas' mostra quantas linhas chegaram ao banco (falhas injetadas e
+    linhas inválidas ficam de fora). A tabela municipios é carregada pelo
+    próprio job (collector.populate_municipios), no banco de DATABASE_URL.
+    """
+    from data import collector
+    from jobs import daily_update
+
+    resultado = {}
+    inicio = time.perf_counter()
+    collector.populate_municipios()
+    resultado["municipios"] = {
+        "linhas": len(fake.municipios),
+        "gravadas": count_municipios(),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+    linhas = len(fake.casos)
+    inicio = time.perf_counter()
+    daily_update.populate_database()
+    segundos = time.perf_counter() - inicio
+    resultado["mosqlimate"] = {
+        "linhas": linhas,
+        "gravadas": count_rows(),
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(linhas / segundos, 1),
+    }
+
+    if incluir_infodengue:
+        # O coletor busca apenas MG, SP e RJ, um geocode por requisição, e
+        # substitui essas UFs no mesmo banco do job diário
+        estados = ["MG", "SP", "RJ"]
+        linhas = int(fake.casos["uf"].isin(estados).sum())
+        inicio = time.perf_counter()
+        collector.populate_database()
+        segundos = time.perf_counter() - inicio
+        resultado["infodengue"] = {
+            "linhas": linhas,
+            "gravadas": count_rows(estados),
+            "segundos": round(segundos, 3),
+            "linhas_por_segundo": round(linhas / segundos, 1),
+        }
+    return resultado
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_api(workers, workdir):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    prazo = time.monotonic() + 60
+    while time.monotonic() < prazo:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API encerrou durante a inicialização (código {proc.returncode})")
+        try:
+            if requests.get(f"{url}/ping", timeout=1).ok:
+                return proc, url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API não respondeu a tempo")
+
+def dashboard_session(url, estados, duracao, rng, registros):
+    """
+    Imita uma sessão do dashboard: filtros de estado e período variados, em
+    sua maioria JSON, com consultas ocasionais a /stats e /ping.
+    """
+    fim = time.monotonic() + duracao
+    with requests.Session() as session:
+        while time.monotonic() < fim:
+            sorteio = rng.random()
+            if sorteio < 0.05:
+                rota, params = "/ping", None
+            elif sorteio < 0.08:
+                rota, params = "/stats", None
+            else:
+                rota = "/data_endpoint"
+                params = {"estado": rng.choice(estados), "dias": rng.choice([30, 90, 180, 365])}
+                if rng.random() < 0.2:
+                    params["formato"] = "csv"
+            inicio = time.perf_counter()
+            try:
+                response = session.get(f"{url}{rota}", params=params, timeout=30)
+                ok = response.ok and not (rota == "/data_endpoint" and response.content.startswith(b'{"error"'))
+                cache = response.headers.get("X-Cache")
+            except requests.exceptions.RequestException:
+                ok, cache = False, None
+            registros.append((rota, (time.perf_counter() - inicio) * 1000, ok, cache))
+            # Tempo de "leitura" do usuário entre interações
+            time.sleep(rng.uniform(0.0, 0.05))
+
+def run_load(url, estados, clientes, duracao, seed, reingestao):
+    registros = []
+    threads = [
+        threading.Thread(
+            target=dashboard_session,
+            args=(url, estados, duracao, random.Random(seed + i), registros),
+            daemon=True,
+        )
+        for i in range(clientes)
+    ]
+    reingestoes = []
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    if reingestao > 0:
+        from jobs import daily_update
+        while time.perf_counter() - inicio < duracao - reingestao:
+            time.sleep(reingestao)
+            t = time.perf_counter()
+            daily_update.populate_database()
+            reingestoes.append(round(time.perf_counter() - t, 3))
+
+    for thread in threads:
+        thread.join()
+    segundos = time.perf_counter() - inicio
+
+    resultado = {"clientes": clientes, "segundos": round(segundos, 2), "reingestoes_s": reingestoes, "rotas": {}}
+    for rota in sorted({r[0] for r in registros}):
+        da_rota = [r for r in registros if r[0] == rota]
+        latencias = [r[1] for r in da_rota if r[2]]
+        resultado["rotas"][rota] = {
+            "requisicoes": len(da_rota),
+            "erros": sum(1 for r in da_rota if not r[2]),
+            "cache_hits": sum(1 for r in da_rota if r[3] == "HIT"),
+            **percentiles(latencias),
+        }
+    resultado["requisicoes_por_segundo"] = round(len(registros) / segundos, 1)
+    resultado["total"] = percentiles([r[1] for r in registros if r[2]])
+    return resultado
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = UpstreamConfig(
+        municipios=args.municipios, semanas=args.semanas, latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms, taxa_erro=args.taxa_erro,
+        taxa_linhas_invalidas=args.taxa_linhas_invalidas, seed=args.seed,
+    )
+    fake = FakeUpstream(config).start()
+    workdir = tempfile.mkdtemp(prefix="arbovirose-loadtest-")
+    configure_environment(fake.url, workdir)
+
+    relatorio = {"configuracao": vars(args), "diretorio": workdir}
+    api = None
+    try:
+        relatorio["ingestao"] = measure_ingest(fake, args.infodengue)
+        api, url = start_api(args.workers, workdir)
+        estados = sorted(fake.casos["uf"].unique())
+        relatorio["api"] = run_load(url, estados, args.clientes, args.duracao, args.seed, args.reingestao)
+        processos = {pid: peak_rss_mb(pid) for pid in process_tree(api.pid)}
+        relatorio["memoria_mb"] = {
+            "harness": round(harness_peak_rss_mb(), 1),
+            "api_processos": {str(pid): round(mb, 1) for pid, mb in processos.items() if mb is not None},
+            "api_total": round(sum(mb for mb in processos.values() if mb is not None), 1),
+        }
+        relatorio["upstream"] = {"requisicoes": fake.requisicoes, "erros_injetados": fake.erros}
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait(timeout=30)
+        fake.stop()
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(texto)
+    return relatorio
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Arbovirose_streamlit/models/predictor.py
+import os
+import logging
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from config.settings import MODELS_DIR
+
+logger = logging.getLogger(__name__)
+
+def load_models(horizontes=(1, 2, 3, 4), path=MODELS_DIR):
+    """
+    Carrega os modelos salvos por horizonte.
+    Retorna um dict {horizonte: modelo} só com os que existem.
+    """
+    modelos = {}
+    for h in horizontes:
+        arquivo = os.path.join(path, f"modelo_h{h}.joblib")
+        if os.path.exists(arquivo):
+            modelos[h] = joblib.load(arquivo)
+        else:
+            logger.warning(f"Modelo para horizonte {h} não encontrado em {arquivo}")
+    return modelos
+
+def predict(store, modelos, semana=-1):
+    """
+    Previsão de casos para todos os municípios a partir de uma semana do
+    feature store (por padrão a mais recente).
+
+    Args:
+        store (FeatureStore): feature store atualizado
+        modelos (dict): {horizonte: modelo}, como em load_models
+        semana (int): posição da semana de origem no store
+
+    Returns:
+        pd.DataFrame: índice codigo_ibge, uma coluna por horizonte
+    """
+    # Fatia (município × feature) lida direto do arquivo mapeado
+    X = store.array()[semana]
+    previsoes = {h: np.clip(modelo.predict(X), 0, None) for h, modelo in sorted(modelos.items())}
+    return pd.DataFrame(previsoes, index=pd.Index(store.codigos, name="codigo_ibge"))
@@ -0,0 +1,247 @@
+# Arbovirose_streamlit/models/reconciliation.py
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from config.settings import MODELS_DIR
+from data.collector import UF_POR_CODIGO
+from models.predictor import predict
+
+logger = logging.getLogger(__name__)
+
+# Grandes regiões pelo primeiro dígito do código IBGE da UF
+REGIOES = {1: "Norte", 2: "Nordeste", 3: "Sudeste", 4: "Sul", 5: "Centro-Oeste"}
+
+# Níveis da hierarquia, do topo para a base (ordem das linhas de S)
+NIVEIS = ["brasil", "regiao", "estado", "municipio"]
+
+METODOS = ("ols", "wls_estrutural", "mint_shrink")
+
+# Suavização exponencial das séries agregadas (previsão base dos níveis acima do município)
+ALFA_SUAVIZACAO = 0.5
+
+# Semanas de resíduos de um passo usadas para estimar a covariância (MinT)
+SEMANAS_RESIDUOS = 52
+
+FORECASTS_FILE = "previsoes.csv"
+
+def build_hierarchy(codigos):
+    """
+    Matriz de soma S da hierarquia município → UF → região → Brasil.
+
+    As linhas de S seguem a ordem Brasil, regiões, UFs e, por último, os
+    municípios na ordem de 'codigos' (o bloco de baixo é a identidade), de
+    modo que y = S @ y_municipios para qualquer previsão coerente.
+
+    Args:
+        codigos (array): códigos IBGE dos municípios (eixo do feature store)
+
+    Returns:
+        tuple: (S, rotulos) com S esparsa (séries × municípios) e rotulos um
+        DataFrame com 'nivel', 'codigo' e 'nome' de cada linha de S
+    """
+    codigos = np.asarray(codigos, dtype="int64")
+    n = len(codigos)
+    ufs = codigos // 100000
+    niveis = {"brasil": np.zeros(n, dtype="int64"), "regiao": ufs // 10, "estado": ufs}
+    nomes = {
+        "brasil": lambda c: "Brasil",
+        "regiao": lambda c: REGIOES.get(c, str(c)),
+        "estado": lambda c: UF_POR_CODIGO.get(c, str(c)),
+    }
+
+    blocos, rotulos = [], []
+    for nivel in NIVEIS[:-1]:
+        grupos, linhas = np.unique(niveis[nivel], return_inverse=True)
+        blocos.append(sp.csr_matrix((np.ones(n), (linhas, np.arange(n))), shape=(len(grupos), n)))
+        rotulos.append(pd.DataFrame({"nivel": nivel, "codigo": grupos, "nome": [nomes[nivel](int(g)) for g in grupos]}))
+    blocos.append(sp.identity(n, format="csr"))
+    rotulos.append(pd.DataFrame({"nivel": "municipio", "codigo": codigos, "nome": codigos.astype(str)}))
+    return sp.vstack(blocos, format="csr"), pd.concat(rotulos, ignore_index=True)
+
+def aggregate_base_forecasts(historico, horizontes, alfa=ALFA_SUAVIZACAO):
+    """
+    Previsão base das séries agregadas por suavização exponencial simples,
+    vetorizada sobre todas as séries (a previsão é a mesma em todos os horizontes).
+
+    Args:
+        historico (np.ndarray): casos (semana × série agregada)
+        horizontes (list): horizontes a prever
+        alfa (float): peso da semana mais recente
+
+    Returns:
+        tuple: (previsoes, residuos) com formas (série × horizonte) e
+        (semana - 1 × série), os resíduos sendo os erros de um passo
+    """
+    nivel = historico[0].astype("float64")
+    residuos = np.empty((max(len(historico) - 1, 0), historico.shape[1]))
+    for t in range(1, len(historico)):
+        residuos[t - 1] = historico[t] - nivel
+        nivel = alfa * historico[t] + (1 - alfa) * nivel
+    return np.repeat(nivel[:, None], len(horizontes), axis=1), residuos
+
+def shrinkage_covariance(residuos):
+    """
+    Covariância dos resíduos com encolhimento para a diagonal (Schäfer &
+    Strimmer, como no MinT-shrink), em forma de baixo posto.
+
+    W = λ·D + (1 - λ)·U Uᵀ, com D as variâncias e U = residuosᵀ/√T. Com
+    milhares de séries e poucas semanas a matriz densa (séries × séries)
+    nunca é formada: λ sai de somas sobre a matriz de Gram (semana × semana).
+
+    Args:
+        residuos (np.ndarray): resíduos de um passo (semana × série)
+
+    Returns:
+        tuple: (D, U, λ)
+    """
+    residuos = np.asarray(residuos, dtype="float64")
+    T = len(residuos)
+    D = (residuos ** 2).sum(axis=0) / T
+    escala = np.sqrt(D)
+    x = np.divide(residuos, escala, out=np.zeros_like(residuos), where=escala > 0)
+
+    # Somas fora da diagonal de r_ij² e Var(r_ij) sem formar (séries × séries)
+    x2 = x ** 2
+    gram = x @ x.T
+    diagonal = (x2.sum(axis=0) ** 2).sum()
+    soma_r2 = ((gram ** 2).sum() - diagonal) / T ** 2
+    soma_w2 = (x2.sum(axis=1) ** 2).sum() - (x2 ** 2).sum()
+    soma_var = (soma_w2 - ((gram ** 2).sum() - diagonal) / T) / (T * (T - 1))
+    lambda_ = 1.0 if soma_r2 <= 0 else float(np.clip(soma_var / soma_r2, 0, 1))
+
+    # Séries sem erro algum ainda precisam de variância positiva
+    D = np.maximum(D, max(D.mean(), 1.0) * 1e-8)
+    return D, residuos.T / np.sqrt(T), lambda_
+
+def reconcile(base, S, metodo="mint_shrink", residuos=None):
+    """
+    Reconcilia previsões base de todos os níveis e horizontes de uma vez.
+
+    Usa a forma com restrições de MinT, ỹ = ŷ - W Cᵀ (C W Cᵀ)⁻¹ C ŷ, com
+    C = [I | -A] (cada agregado menos a soma dos filhos). Só C W Cᵀ é
+    invertida, e ela tem o tamanho do número de agregados (dezenas), não
+    de municípios. W depende do método:
+
+    - 'ols': identidade
+    - 'wls_estrutural': número de municípios sob cada série
+    - 'mint_shrink': covariância dos resíduos com encolhimento
+
+    Previsões negativas de municípios são zeradas e os agregados refeitos
+    por soma, o que mantém o resultado coerente.
+
+    Args:
+        base (np.ndarray): previsões base (série × horizonte), linhas como em S
+        S (scipy.sparse matrix): matriz de soma de build_hierarchy
+        metodo (str): um de METODOS
+        residuos (np.ndarray): resíduos (semana × série), exigido por 'mint_shrink'
+
+    Returns:
+        np.ndarray: previsões reconciliadas (série × horizonte)
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de reconciliação desconhecido: {metodo}")
+    base = np.asarray(base, dtype="float64")
+    n_series, n = S.shape
+    m = n_series - n
+    A = S[:m]
+    Ct = sp.vstack([sp.identity(m), -A.T], format="csr")
+
+    U, lambda_ = None, 1.0
+    if metodo == "ols":
+        D = np.ones(n_series)
+    elif metodo == "wls_estrutural":
+        D = np.asarray(S.sum(axis=1), dtype="float64").ravel()
+    else:
+        if residuos is None:
+            raise ValueError("Reconciliação mint_shrink exige os resíduos das previsões base")
+        D, U, lambda_ = shrinkage_covariance(residuos)
+
+    WCt = (sp.diags(lambda_ * D) @ Ct).toarray()
+    if U is not None and lambda_ < 1:
+        CU = U[:m] - A @ U[m:]
+        WCt += (1 - lambda_) * (U @ CU.T)
+    CWCt = Ct.T @ WCt
+    Cy = base[:m] - A @ base[m:]
+    reconciliadas = base - WCt @ np.linalg.solve(CWCt, Cy)
+
+    municipios = np.clip(reconciliadas[m:], 0, None)
+    return S @ municipios
+
+def reconcile_forecasts(store, modelos, semana=-1, metodo="mint_shrink", semanas_residuos=SEMANAS_RESIDUOS):
+    """
+    Previsões coerentes para municípios, UFs, regiões e Brasil.
+
+    A previsão base dos municípios vem dos modelos (predict); a dos
+    agregados, de uma suavização exponencial das séries somadas. Os
+    resíduos de um passo das últimas 'semanas_residuos' semanas (modelo do
+    menor horizonte e suavização) alimentam a covariância do MinT. São
+    resíduos dentro da amostra de treino, como é usual no MinT.
+
+    Args:
+        store (FeatureStore): feature store atualizado
+        modelos (dict): {horizonte: modelo}, como em load_models
+        semana (int): posição da semana de origem no store
+        metodo (str): um de METODOS
+        semanas_residuos (int): semanas de resíduos para o MinT
+
+    Returns:
+        pd.DataFrame: índice (nivel, codigo), coluna 'nome' e uma coluna por horizonte
+    """
+    if not modelos:
+        raise ValueError("Nenhum modelo para reconciliar")
+    S, rotulos = build_hierarchy(store.codigos)
+    m = S.shape[0] - S.shape[1]
+    A = S[:m]
+    horizontes = sorted(modelos)
+    origem = range(len(store))[semana]
+
+    casos = store.feature("casos")[:origem + 1]
+    historico = np.asarray((A @ np.asarray(casos, dtype="float64").T).T)
+    previsoes_agregadas, residuos_agregados = aggregate_base_forecasts(historico, horizontes)
+    base = np.vstack([previsoes_agregadas, predict(store, modelos, origem).to_numpy()])
+
+    residuos = None
+    if metodo == "mint_shrink":
+        inicio = max(0, origem - semanas_residuos)
+        if origem - inicio < 2:
+            raise ValueError(f"Feature store com {origem + 1} semanas é curto para estimar os resíduos")
+        features = store.array()
+        ajustados = modelos[horizontes[0]].predict(features[inicio:origem].reshape(-1, len(store.features)))
+        residuos_municipios = np.asarray(casos[inicio + 1:origem + 1], dtype="float64") - ajustados.reshape(origem - inicio, -1)
+        residuos = np.hstack([residuos_agregados[inicio:origem], residuos_municipios])
+
+    reconciliadas = reconcile(base, S, metodo, residuos)
+    logger.info(f"Previsões reconciliadas ({metodo}) para {S.shape[0]} séries e {len(horizontes)} horizontes")
+    result = pd.DataFrame(reconciliadas, columns=horizontes)
+    result.insert(0, "nome", rotulos["nome"].to_numpy())
+    result.index = pd.MultiIndex.from_frame(rotulos[["nivel", "codigo"]])
+    return result
+
+def save_forecasts(previsoes, semana, path=MODELS_DIR):
+    """
+    Salva as previsões reconciliadas em MODELS_DIR/previsoes.csv, com a
+    semana de origem, trocando o arquivo atomicamente.
+    Retorna o caminho do arquivo.
+    """
+    os.makedirs(path, exist_ok=True)
+    arquivo = os.path.join(path, FORECASTS_FILE)
+    tmp_path = arquivo + ".tmp"
+    previsoes.assign(semana=pd.Timestamp(semana).strftime("%Y-%m-%d")).to_csv(tmp_path)
+    os.replace(tmp_path, arquivo)
+    logger.info(f"Previsões reconciliadas salvas em {arquivo}")
+    return arquivo
+
+def load_forecasts(path=MODELS_DIR):
+    """
+    Previsões reconciliadas salvas pelo retreino semanal, com o mesmo
+    formato de reconcile_forecasts mais a coluna 'semana', ou None se não houver.
+    """
+    arquivo = os.path.join(path, FORECASTS_FILE)
+    if not os.path.exists(arquivo):
+        return None
+    previsoes = pd.read_csv(arquivo, index_col=["nivel", "codigo"])
+    return previsoes.rename(columns=lambda c: int(c) if c.isdigit() else c)
@@ -0,0 +1,60 @@
+# Arbovirose_streamlit/models/trainer.py
+import os
+import logging
+
+import joblib
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from config.settings import MODELS_DIR
+
+logger = logging.getLogger(__name__)
+
+def build_training_set(store, horizonte=1):
+    """
+    Monta (X, y) direto do feature store.
+
+    X são as features da semana t e y os casos da semana t + horizonte,
+    para todos os municípios. Como a semana é o eixo externo do array, X
+    é uma view contígua (reshape) do arquivo mapeado em memória. y é uma
+    única feature: o reshape também não copia, porque semana e município
+    têm passo uniforme nessa coluna, mas o resultado é uma view com passo
+    (não contígua), que o estimador pode copiar ao treinar.
+
+    Args:
+        store (FeatureStore): feature store atualizado
+        horizonte (int): semanas à frente a prever
+
+    Returns:
+        tuple: (X, y) com formas (amostras, features) e (amostras,)
+    """
+    features = store.array()
+    semanas, municipios, n_features = features.shape
+    if semanas <= horizonte:
+        raise ValueError(f"Feature store com {semanas} semanas é curto para horizonte {horizonte}")
+    X = features[:semanas - horizonte].reshape(-1, n_features)
+    y = features[horizonte:, :, store.features.index("casos")].reshape(-1)
+    return X, y
+
+def train_model(store, horizonte=1):
+    """
+    Treina o modelo de previsão de casos para um horizonte.
+    Retorna o estimador treinado.
+    """
+    X, y = build_training_set(store, horizonte)
+    logger.info(f"Treinando modelo h={horizonte} com {X.shape[0]} amostras e {X.shape[1]} features")
+    model = HistGradientBoostingRegressor(loss="poisson", max_iter=200, random_state=0)
+    model.fit(X, y)
+    model.features_ = list(store.features)
+    model.horizonte_ = horizonte
+    return model
+
+def save_model(model, path=MODELS_DIR):
+    """
+    Salva o modelo em MODELS_DIR/modelo_h{horizonte}.joblib.
+    Retorna o caminho do arquivo.
+    """
+    os.makedirs(path, exist_ok=True)
+    arquivo = os.path.join(path, f"modelo_h{model.horizonte_}.joblib")
+    joblib.dump(model, arquivo)
+    logger.info(f"Modelo salvo em {arquivo}")
+    return arquivo
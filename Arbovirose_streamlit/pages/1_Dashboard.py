@@ -1,52 +1,106 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import numpy as np
-from config.settings import DATABASE_URL
+from config.settings import DATABASE_URL, INDICATORS_DIR
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
+from app import load_fallback_data
+from components.charts import create_time_series_chart
+from components.figure_cache import dataset_version, figure_cache
+from data.processor import FeatureStore, indicators_frame
+from data.storage import connect, load_municipios
+from models.reconciliation import load_forecasts
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
 st.title("📊 Dashboard de Monitoramento")
 
 @st.cache_data(ttl=60)
-def get_realtime_data():
-    engine = create_engine(DATABASE_URL)
-    @st.cache_data(ttl=60)
 def get_realtime_data():
     try:
         engine = create_engine(DATABASE_URL)
         data = pd.read_sql('SELECT * FROM epi_data', engine)
-        return data.assign(previsao=lambda x: x['casos_confirmados'] * (1 + ...))
-    
-    except SQLAlchemyError as e:
+        data['data'] = pd.to_datetime(data['data'])
+    # Tabela ausente chega como pandas.errors.DatabaseError, não SQLAlchemyError
+    except (SQLAlchemyError, pd.errors.DatabaseError) as e:
         st.error(f"Erro no banco de dados: {str(e)}")
         # Carregar dados de backup ou amostra
-        return load_backup_data()
+        data = load_fallback_data()
+    else:
+        # Tabela recém-criada (create_schema) e ainda sem a primeira ingestão
+        if data.empty:
+            st.warning("Tabela epi_data vazia. Execute a atualização diária (jobs/daily_update.py).")
+            data = load_fallback_data()
+
+    # Previsão ingênua (média móvel de 7 registros), usada sem previsões reconciliadas
+    data = data.assign(previsao=lambda x: x['casos_confirmados'].rolling(7, min_periods=1).mean())
+    # Hash calculado uma vez por carga; identifica as figuras em cache
+    data.attrs['versao'] = dataset_version(data)
+    return data
+
+@st.cache_data(ttl=60)
+def get_indicators():
+    """
+    Indicadores das duas últimas semanas por município (calculados pelo job diário).
+    """
+    store = FeatureStore(INDICATORS_DIR)
+    if len(store) < 2:
+        return None, None
+    conn = connect(DATABASE_URL)
+    try:
+        municipios = load_municipios(conn)
+    finally:
+        conn.close()
+    return indicators_frame(store, -1, municipios), indicators_frame(store, -2, municipios)
+
+@st.cache_data(ttl=60)
+def get_forecasts():
+    """
+    Previsões reconciliadas do retreino semanal (somam de município até Brasil).
+    """
+    return load_forecasts()
 
 if st.button("🔄 Atualizar Dados"):
     st.cache_data.clear()
     st.rerun()
 
 data = get_realtime_data()
+indicadores, indicadores_anterior = get_indicators()
+previsoes = get_forecasts()
 
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    casos_hoje = data['casos_confirmados'].iloc[-1]
-    casos_ontem = data['casos_confirmados'].iloc[-2]
-    delta_casos = casos_hoje - casos_ontem
-    st.metric("Casos Hoje", f"{casos_hoje:,}", f"{delta_casos:+.0f}")
+    # O backup pode ter menos de dois registros
+    if len(data) >= 2:
+        casos_hoje = data['casos_confirmados'].iloc[-1]
+        casos_ontem = data['casos_confirmados'].iloc[-2]
+        delta_casos = casos_hoje - casos_ontem
+        st.metric("Casos Hoje", f"{casos_hoje:,}", f"{delta_casos:+.0f}")
+    else:
+        st.metric("Casos Hoje", "—")
 
 with col2:
-    previsao_7d = data['previsao'].tail(7).sum()
-    st.metric("Previsão 7 dias", f"{previsao_7d:,.0f}", "23%")
+    # Próxima semana no nível Brasil, coerente com os totais por UF e município
+    if previsoes is not None and 1 in previsoes.columns and indicadores is not None:
+        previsao_7d = previsoes.loc[("brasil", 0), 1]
+        casos_semana = indicadores['casos'].sum()
+        delta_previsao = f"{(previsao_7d / casos_semana - 1) * 100:+.0f}%" if casos_semana else None
+        st.metric("Previsão 7 dias", f"{previsao_7d:,.0f}", delta_previsao)
+    else:
+        previsao_7d = data['previsao'].tail(7).sum()
+        st.metric("Previsão 7 dias", f"{previsao_7d:,.0f}", "23%")
 
 with col3:
-    municipios_alerta = 45
-    st.metric("Municípios em Alerta", municipios_alerta, "-3")
+    # Alerta: intervalo de credibilidade do Rt inteiramente acima de 1
+    if indicadores is not None:
+        municipios_alerta = int((indicadores['rt_inferior'] > 1).sum())
+        delta_alerta = municipios_alerta - int((indicadores_anterior['rt_inferior'] > 1).sum())
+        st.metric("Municípios em Alerta", municipios_alerta, f"{delta_alerta:+d}")
+    else:
+        st.metric("Municípios em Alerta", "—")
 
 with col4:
     eficacia = 89.2
@@ -56,27 +110,12 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("Tendência vs Previsão")
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=data['data'],
-        y=data['casos_confirmados'],
-        mode='lines+markers',
-        name='Casos Reais',
-        line=dict(color='blue')
-    ))
-    fig.add_trace(go.Scatter(
-        x=data['data'],
-        y=data['previsao'],
-        mode='lines+markers',
-        name='Previsão',
-        line=dict(color='red', dash='dash')
-    ))
-    fig.update_layout(
-        title="Casos Confirmados vs Previsão",
-        xaxis_title="Data",
-        yaxis_title="Número de Casos",
-        hovermode='x unified'
-    )
+    def tendencia_previsao():
+        fig = create_time_series_chart(data)
+        fig.update_layout(title="Casos Confirmados vs Previsão")
+        return fig
+
+    fig = figure_cache.get_or_build("tendencia_previsao", {}, dataset_version(data), tendencia_previsao)
     st.plotly_chart(fig, use_container_width=True)
 
 with col2:
@@ -87,14 +126,21 @@ with col2:
     st.plotly_chart(fig, use_container_width=True)
 
 st.subheader("🚨 Alertas Ativos")
-alertas = pd.DataFrame({
-    'Município': ['Ipatinga', 'Coronel Fabriciano', 'Timóteo', 'Santana do Paraíso'],
-    'Estado': ['MG', 'MG', 'MG', 'MG'],
-    'Nível': ['Alto', 'Médio', 'Alto', 'Baixo'],
-    'Casos': [156, 89, 134, 34],
-    'Tendência': ['↗️', '↘️', '↗️', '→']
-})
-st.dataframe(alertas, use_container_width=True, hide_index=True)
+if indicadores is not None:
+    # Maior incidência média das últimas 4 semanas entre os municípios com Rt > 1
+    ativos = indicadores[indicadores['rt_inferior'] > 1].nlargest(20, 'incidencia_mm4')
+    rt_anterior = indicadores_anterior['rt'].reindex(ativos.index)
+    alertas = pd.DataFrame({
+        'Município': ativos['nome'],
+        'Estado': ativos['estado'],
+        'Incidência (100 mil, média 4 sem.)': ativos['incidencia_mm4'].round(1),
+        'Casos': ativos['casos'].astype(int),
+        'Rt': ativos['rt'].round(2),
+        'Tendência': np.where(ativos['rt'] > rt_anterior, '↗️', np.where(ativos['rt'] < rt_anterior, '↘️', '→')),
+    })
+    st.dataframe(alertas, use_container_width=True, hide_index=True)
+else:
+    st.info("Indicadores ainda não calculados. Execute a atualização diária (jobs/daily_update.py).")
 
 if st.checkbox("Auto-refresh (30s)"):
     import time
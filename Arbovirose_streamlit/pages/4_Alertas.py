@@ -0,0 +1,112 @@
+import streamlit as st
+import pandas as pd
+from streamlit_folium import st_folium
+from config.settings import DATABASE_URL, INDICATORS_DIR
+from data.storage import connect, load_epi_data
+from data.spatial import build_municipality_index, neighbor_case_sums
+from data.processor import FeatureStore, attach_codigo_ibge, indicators_frame
+from components.maps import create_neighbors_map
+
+st.set_page_config(page_title="Alertas", page_icon="🚨", layout="wide")
+
+st.title("🚨 Alertas Próximos")
+
+@st.cache_resource(ttl=3600)
+def get_spatial_index():
+    conn = connect(DATABASE_URL)
+    try:
+        return build_municipality_index(conn)
+    finally:
+        conn.close()
+
+@st.cache_data(ttl=60)
+def get_recent_cases(semanas=4):
+    """
+    Casos confirmados nas últimas semanas, somados por município.
+    """
+    conn = connect(DATABASE_URL)
+    try:
+        data = load_epi_data(conn)
+    finally:
+        conn.close()
+    if data.empty:
+        return data
+    data['data'] = pd.to_datetime(data['data'])
+    recentes = data[data['data'] > data['data'].max() - pd.Timedelta(weeks=semanas)]
+    return recentes.groupby(['estado', 'municipio'], as_index=False)['casos_confirmados'].sum()
+
+@st.cache_data(ttl=60)
+def get_indicators():
+    """
+    Indicadores da semana mais recente por município (calculados pelo job diário).
+    """
+    return indicators_frame(FeatureStore(INDICATORS_DIR))
+
+index = get_spatial_index()
+casos = get_recent_cases()
+indicadores = get_indicators()
+
+if index is None:
+    st.warning("Tabela de municípios sem coordenadas. Execute a carga de municípios (data/collector.py).")
+    st.stop()
+
+casos = attach_codigo_ibge(casos, index.municipios) if not casos.empty else casos
+casos_por_codigo = (
+    casos.dropna(subset=['codigo_ibge']).groupby('codigo_ibge')['casos_confirmados'].sum()
+    if not casos.empty else pd.Series(dtype='float64')
+)
+
+with st.sidebar:
+    st.header("Filtros")
+    estados = sorted(index.municipios['estado'].dropna().unique())
+    estado = st.selectbox("Estado", estados)
+    municipios_uf = index.municipios[index.municipios['estado'] == estado].sort_values('nome')
+    nome = st.selectbox("Município", municipios_uf['nome'])
+    raio_km = st.slider("Raio (km)", min_value=10, max_value=300, value=50, step=10)
+
+codigo = int(municipios_uf.loc[municipios_uf['nome'] == nome, 'codigo_ibge'].iloc[0])
+lat, lon = index.coordenadas(codigo)
+
+vizinhos = index.vizinhos(codigo, raio_km=raio_km)
+vizinhos['casos_confirmados'] = vizinhos['codigo_ibge'].map(casos_por_codigo).fillna(0).astype(int)
+vizinhos['incidencia_mm4'] = vizinhos['codigo_ibge'].map(indicadores['incidencia_mm4']).round(1)
+vizinhos['rt'] = vizinhos['codigo_ibge'].map(indicadores['rt']).round(2)
+
+col1, col2, col3, col4, col5 = st.columns(5)
+with col1:
+    st.metric("Casos (4 semanas)", f"{int(casos_por_codigo.get(codigo, 0)):,}")
+with col2:
+    st.metric(f"Casos em até {raio_km} km", f"{int(vizinhos['casos_confirmados'].sum()):,}")
+with col3:
+    pressao = neighbor_case_sums(index, casos_por_codigo)
+    st.metric("Pressão dos 8 vizinhos", f"{pressao.get(codigo, 0):,.0f}")
+with col4:
+    incidencia = indicadores['incidencia_mm4'].get(codigo, float('nan'))
+    st.metric("Incidência (100 mil, média 4 sem.)", "—" if pd.isna(incidencia) else f"{incidencia:,.1f}")
+with col5:
+    rt = indicadores['rt'].get(codigo, float('nan'))
+    if pd.isna(rt):
+        st.metric("Rt", "—")
+    else:
+        st.metric("Rt", f"{rt:.2f}", f"IC 95%: {indicadores['rt_inferior'][codigo]:.2f}–{indicadores['rt_superior'][codigo]:.2f}", delta_color="off")
+
+col1, col2 = st.columns([3, 2])
+with col1:
+    mapa = create_neighbors_map(
+        {'municipio': nome, 'latitude': lat, 'longitude': lon,
+         'casos_confirmados': int(casos_por_codigo.get(codigo, 0))},
+        vizinhos,
+        raio_km=raio_km
+    )
+    st_folium(mapa, use_container_width=True, height=500)
+with col2:
+    st.subheader("Municípios próximos")
+    st.dataframe(
+        vizinhos[['nome', 'estado', 'distancia_km', 'casos_confirmados', 'incidencia_mm4', 'rt']]
+        .sort_values('casos_confirmados', ascending=False)
+        .rename(columns={'nome': 'Município', 'estado': 'Estado',
+                         'distancia_km': 'Distância (km)', 'casos_confirmados': 'Casos',
+                         'incidencia_mm4': 'Incidência (100 mil)', 'rt': 'Rt'}),
+        use_container_width=True,
+        hide_index=True
+    )
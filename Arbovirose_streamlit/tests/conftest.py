@@ -0,0 +1,8 @@
+# Arbovirose_streamlit/tests/conftest.py
+import os
+import sys
+
+# Os módulos do projeto são importados a partir de Arbovirose_streamlit, como nos jobs
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
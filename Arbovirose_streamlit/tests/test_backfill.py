@@ -0,0 +1,90 @@
+# Arbovirose_streamlit/tests/test_backfill.py
+import os
+import sys
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from loadtest.fake_upstream import FakeUpstream, UpstreamConfig
+from loadtest.harness import configure_environment
+
+CHAVE = ["estado", "municipio", "data"]
+
+# Pacotes que leem config.settings (direta ou indiretamente) na importação
+PACOTES = ("config", "data", "jobs", "models", "components", "api")
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """
+    Réplica local do Mosqlimate e banco SQLite em tmp_path. O ambiente é
+    configurado antes de importar os jobs, que leem config.settings na importação.
+    """
+    config = UpstreamConfig(municipios=50, semanas=20, taxa_linhas_invalidas=0.0)
+    fake = FakeUpstream(config).start()
+    monkeypatch.chdir(tmp_path)
+    with mock.patch.dict(os.environ):
+        configure_environment(fake.url, str(tmp_path))
+        yield fake
+    fake.stop()
+    # O próximo teste reimporta os jobs com o próprio banco
+    for nome in [m for m in sys.modules if m.split(".")[0] in PACOTES]:
+        del sys.modules[nome]
+
+def epi_data():
+    from data.storage import connect, load_epi_data
+
+    conn = connect()
+    try:
+        return load_epi_data(conn)
+    finally:
+        conn.close()
+
+def test_backfill_overlapping_loaded_rows_replaces_them(upstream):
+    from data import collector
+    from jobs import backfill, daily_update
+
+    collector.populate_municipios()
+    daily_update.populate_database()
+    carregadas = epi_data()
+    assert len(carregadas) == len(upstream.casos)
+
+    # A réplica devolve a série inteira para cada ano pedido: os dois lotes
+    # repetem todas as linhas já gravadas pelo job diário
+    inicio = (pd.Timestamp.now() - pd.Timedelta(days=400)).strftime("%Y-%m-%d")
+    backfill.main(["--inicio", inicio])
+
+    data = epi_data()
+    assert len(data) == len(upstream.casos)
+    assert not data.duplicated(CHAVE).any()
+    assert data["casos_confirmados"].sum() == carregadas["casos_confirmados"].sum()
+
+def test_backfill_replaces_only_received_states_and_period(upstream):
+    from data import collector
+    from data.storage import connect
+    from jobs import backfill, daily_update
+
+    collector.populate_municipios()
+    daily_update.populate_database()
+    carregadas = epi_data()
+
+    # Últimas 5 semanas de MG revisadas, enviadas em dois lotes iguais
+    semanas = sorted(carregadas["data"].unique())[-5:]
+    no_periodo = (carregadas["estado"] == "MG") & carregadas["data"].isin(semanas)
+    revisadas = carregadas[no_periodo].assign(casos_confirmados=lambda x: x["casos_confirmados"] + 1)
+    assert backfill.backfill([revisadas, revisadas]) == len(revisadas)
+
+    data = epi_data()
+    assert len(data) == len(carregadas)
+    assert not data.duplicated(CHAVE).any()
+    fora = (data["estado"] != "MG") | ~data["data"].isin(semanas)
+    assert data.loc[fora, "casos_confirmados"].sum() == carregadas.loc[~no_periodo, "casos_confirmados"].sum()
+    assert data.loc[~fora, "casos_confirmados"].sum() == revisadas["casos_confirmados"].sum()
+
+    # O segundo lote repete as chaves do primeiro e vai para a quarentena
+    conn = connect()
+    try:
+        motivos = conn.execute("SELECT motivo, COUNT(*) FROM epi_data_quarantine GROUP BY motivo").fetchall()
+    finally:
+        conn.close()
+    assert motivos == [("duplicado", len(revisadas))]
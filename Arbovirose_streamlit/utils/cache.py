@@ -0,0 +1,74 @@
+# Arbovirose_streamlit/utils/cache.py
+import threading
+from collections import OrderedDict
+
+class ByteLRUCache:
+    """
+    Cache LRU de valores em bytes, limitado pelo total de bytes guardados.
+
+    Seguro para uso concorrente entre threads. Chaves devem ser hashable;
+    valores são guardados já serializados, prontos para envio ou gravação.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    def get(self, key):
+        """Retorna o valor guardado (marcando-o como recente) ou None"""
+        with self._lock:
+            valor = self._itens.get(key)
+            if valor is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def put(self, key, valor):
+        """
+        Guarda um valor, removendo os menos usados até caber no limite.
+        Valores maiores que o limite inteiro não são guardados.
+        """
+        tamanho = len(valor)
+        if tamanho > self.max_bytes:
+            return False
+        with self._lock:
+            anterior = self._itens.pop(key, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            while self._itens and self._bytes + tamanho > self.max_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self._bytes -= len(removido)
+                self.evictions += 1
+            self._itens[key] = valor
+            self._bytes += tamanho
+        return True
+
+    def clear(self):
+        """Remove todos os itens (as estatísticas de acerto são mantidas)"""
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Estatísticas de uso do cache"""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "entries": len(self._itens),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / consultas if consultas else 0.0,
+            }
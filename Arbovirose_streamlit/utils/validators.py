@@ -1,5 +1,23 @@
 # Arbovirose_streamlit/utils/validators.py
 import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+EPI_COLUMNS = ["estado", "municipio", "data", "casos_confirmados"]
+
+UFS = {
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+}
+
+# Limite superior plausível de casos por município e registro
+MAX_CASOS_REGISTRO = 1_000_000
+
+# Janela plausível de datas: início da série histórica até uma semana à frente
+DATA_MINIMA = "2000-01-01"
+DIAS_FUTURO_TOLERADOS = 7
 
 def validate_api_response(response):
     """Valida a estrutura da resposta da API"""
@@ -13,3 +31,150 @@ def validate_db_connection_string(connection_string):
     """Valida formato da string de conexão"""
     pattern = r"^\w+://(\w+):(\w+)@[\w.-]+:\d+/\w+$"
     return re.match(pattern, connection_string) is not None
+
+def epidemiological_week(datas):
+    """
+    Semana epidemiológica (ano, semana) no calendário do SINAN/InfoDengue.
+
+    As semanas vão de domingo a sábado, como na checagem de duplicidade de
+    validate_epi_data (1970-01-04 é o domingo de referência), e a semana 1
+    é a primeira com ao menos quatro dias no ano (a que contém 4 de janeiro).
+
+    Args:
+        datas: uma data ou um array/Series de datas
+
+    Returns:
+        tuple: (ano, semana), inteiros ou arrays de inteiros
+    """
+    dias = np.asarray(pd.to_datetime(datas), dtype="datetime64[D]").astype("int64")
+    domingo = dias - np.mod(dias - 3, 7)
+    # O ano da semana é o da sua quarta-feira
+    ano = (domingo + 3).astype("datetime64[D]").astype("datetime64[Y]").astype("int64")
+    quatro_jan = ano.astype("datetime64[Y]").astype("datetime64[D]").astype("int64") + 3
+    semana = (domingo - (quatro_jan - np.mod(quatro_jan - 3, 7))) // 7 + 1
+    if np.ndim(dias) == 0:
+        return int(ano) + 1970, int(semana)
+    return ano + 1970, semana
+
+def _normalize_categories(values, transform):
+    """
+    Aplica 'transform' apenas aos valores distintos da coluna e devolve
+    (codigos, categorias_normalizadas), com -1 para ausentes. Colunas de
+    ingestão têm poucos valores distintos, então isso evita operações de
+    string por linha.
+    """
+    codes, uniques = pd.factorize(values)
+    normalized = transform(pd.Series(uniques, dtype="string"))
+    remap, categories = pd.factorize(normalized)
+    return np.append(remap, -1)[codes], pd.Series(categories, dtype="string")
+
+def validate_epi_data(data, municipios=None, max_casos=MAX_CASOS_REGISTRO, data_minima=DATA_MINIMA, data_maxima=None):
+    """
+    Valida em lote um DataFrame de casos antes da inserção em epi_data.
+
+    Todas as verificações são operações vetorizadas sobre colunas inteiras
+    (sem iterar linha a linha): tipos, faixas, integridade referencial com
+    a tabela de municípios e duplicidade de (estado, municipio, semana
+    epidemiológica).
+
+    Args:
+        data (pd.DataFrame): dados brutos com colunas 'estado', 'municipio', 'data' e 'casos_confirmados'
+        municipios (pd.DataFrame): referência com colunas 'estado' e 'nome'; se vazia, a checagem referencial é ignorada
+        max_casos (int): maior valor aceito em 'casos_confirmados'
+        data_minima (str): data mais antiga aceita (inclusiva)
+        data_maxima (str): data mais recente aceita; padrão hoje + DIAS_FUTURO_TOLERADOS
+
+    Returns:
+        tuple: (validos, rejeitados). 'validos' vem normalizado (data ISO, casos inteiros);
+        'rejeitados' mantém os valores originais e traz a coluna 'motivo'.
+    """
+    raw = data.reindex(columns=EPI_COLUMNS).reset_index(drop=True)
+
+    # Estado e município são normalizados por categoria distinta e depois
+    # combinados em um único código inteiro por par (estado, municipio).
+    uf_codes, ufs = _normalize_categories(raw["estado"], lambda s: s.str.strip().str.upper())
+    mun_codes, nomes = _normalize_categories(raw["municipio"], lambda s: s.str.strip())
+    # Posição extra (False) para o código -1 de valores ausentes
+    uf_ok = np.append(ufs.isin(UFS).fillna(False).to_numpy(dtype=bool), False)
+    nome_ok = np.append((nomes != "").fillna(False).to_numpy(dtype=bool), False)
+    estado_invalido = ~uf_ok[uf_codes]
+    municipio_ausente = ~nome_ok[mun_codes]
+
+    # Datas também se repetem muito (uma por semana): conversão só dos distintos.
+    # Números não são datas (to_datetime os leria como nanossegundos desde
+    # 1970, ex.: a semana epidemiológica 202401), e fusos mistos viram UTC.
+    data_codes, datas_distintas = pd.factorize(raw["data"])
+    datas_distintas = pd.Series(datas_distintas, dtype=object)
+    tipo_data = datas_distintas.map(lambda v: isinstance(v, (str, date, np.datetime64))).astype(bool)
+    datas_distintas = pd.to_datetime(datas_distintas.where(tipo_data), errors="coerce", format="mixed", utc=True).dt.tz_localize(None)
+    if data_maxima is None:
+        data_maxima = pd.Timestamp.now().normalize() + pd.Timedelta(days=DIAS_FUTURO_TOLERADOS)
+    no_intervalo = datas_distintas.between(pd.Timestamp(data_minima), pd.Timestamp(data_maxima))
+    data_ok = np.append(datas_distintas.notna().to_numpy(), False)
+    data_no_intervalo = np.append(no_intervalo.to_numpy(dtype=bool), False)
+    dias = np.append(datas_distintas.to_numpy(dtype="datetime64[D]").astype("int64"), 0)[data_codes]
+    datas_iso = np.append(datas_distintas.dt.strftime("%Y-%m-%d").to_numpy(dtype=object), None)
+    casos = pd.to_numeric(raw["casos_confirmados"], errors="coerce").to_numpy(dtype="float64")
+
+    checks = [
+        ("estado_invalido", estado_invalido),
+        ("municipio_ausente", municipio_ausente),
+        ("data_invalida", ~data_ok[data_codes]),
+        ("data_fora_do_intervalo", data_ok[data_codes] & ~data_no_intervalo[data_codes]),
+        ("casos_nao_numericos", np.isnan(casos)),
+        ("casos_negativos", casos < 0),
+        ("casos_nao_inteiros", np.isfinite(casos) & (np.mod(casos, 1) != 0)),
+        ("casos_acima_limite", casos > max_casos),
+    ]
+
+    # Pares são comparados sem diferenciar maiúsculas/minúsculas
+    mun_cf, chaves_mun = pd.factorize(nomes.str.casefold())
+    mun_cf = np.append(mun_cf, -1)[mun_codes]
+    par_codes, pares = pd.factorize(
+        uf_codes.astype("int64") * (len(chaves_mun) + 1) + mun_cf, use_na_sentinel=False
+    )
+    if municipios is not None and not municipios.empty:
+        referencia = set(
+            municipios["estado"].astype("string").str.strip().str.upper()
+            + "|" + municipios["nome"].astype("string").str.strip().str.casefold()
+        )
+        par_uf, par_mun = np.divmod(pares, len(chaves_mun) + 1)
+        par_chaves = (
+            pd.Series(np.append(ufs.to_numpy(dtype=object), None)[par_uf], dtype="string")
+            + "|" + pd.Series(np.append(np.asarray(chaves_mun, dtype=object), None)[par_mun], dtype="string")
+        )
+        par_conhecido = par_chaves.isin(referencia).fillna(False).to_numpy(dtype=bool)
+        desconhecido = ~par_conhecido[par_codes]
+        checks.append(("municipio_desconhecido", desconhecido & ~municipio_ausente & ~estado_invalido))
+
+    # Motivos acumulados como bits; o texto só é montado para as rejeitadas
+    flags = np.zeros(len(raw), dtype=np.uint16)
+    for bit, (_, mask) in enumerate(checks):
+        flags |= mask.astype(np.uint16) << bit
+
+    # Duplicidade só é avaliada entre linhas que passaram nas demais checagens;
+    # a primeira ocorrência de (estado, municipio, semana) é mantida. A semana
+    # epidemiológica começa no domingo (1970-01-04 é o domingo de referência).
+    ok = flags == 0
+    chave = pd.DataFrame({"par": par_codes, "semana": np.floor_divide(dias - 3, 7)})
+    duplicado = np.zeros(len(raw), dtype=bool)
+    duplicado[ok] = chave[ok].duplicated(keep="first").to_numpy()
+    checks.append(("duplicado", duplicado))
+    flags |= duplicado.astype(np.uint16) << (len(checks) - 1)
+
+    valido = flags == 0
+    validos = pd.DataFrame({
+        "estado": ufs.to_numpy(dtype=object)[uf_codes[valido]],
+        "municipio": nomes.to_numpy(dtype=object)[mun_codes[valido]],
+        "data": datas_iso[data_codes[valido]],
+        "casos_confirmados": casos[valido].astype("int64"),
+    })
+
+    rejeitados = raw[~valido].copy()
+    flags_rejeitados = flags[~valido]
+    motivo = pd.Series("", index=rejeitados.index, dtype=object)
+    for bit, (nome, _) in enumerate(checks):
+        tem = (flags_rejeitados >> bit) & 1 == 1
+        motivo = motivo.where(~tem, motivo + nome + ";")
+    rejeitados["motivo"] = motivo.str.rstrip(";")
+    return validos, rejeitados.reset_index(drop=True)
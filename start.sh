@@ -11,4 +11,5 @@ chmod 666 /var/lib/render/data/arbovirose.db
 # Inicia os serviços
 cd Arbovirose_streamlit
 streamlit run app.py --server.port $PORT &
-gunicorn app:health_app -b 0.0.0.0:8081
+# API com um worker por núcleo; todos mapeiam o mesmo snapshot somente leitura
+gunicorn api:app -k uvicorn.workers.UvicornWorker -w ${WEB_CONCURRENCY:-$(nproc)} -b 0.0.0.0:8081